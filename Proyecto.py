@@ -5,14 +5,35 @@ Universidad La Salle Nezahualcóyotl - Proyecto Integrador
 Combina algoritmos de grafos y lógica difusa para optimizar rutas entre servidores
 """
 
+import os
+import io
+import glob
 import time
+import bisect
+import cProfile
+import pstats
+import functools
+import heapq
+import tracemalloc
 import json
+import zlib
+import argparse
 import logging
+import threading
+import multiprocessing
 import numpy as np
 import pandas as pd
 import networkx as nx
 import skfuzzy as fuzz
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 from ping3 import ping
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -27,24 +48,483 @@ logging.basicConfig(
     ]
 )
 
+class Instrumentation:
+    """Temporizadores por fase y por función, contadores e histogramas del sistema"""
+    
+    HISTOGRAM_BOUNDS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._profiler = None
+        self.reset()
+    
+    def reset(self):
+        """Descarta todo lo medido hasta ahora"""
+        with self._lock:
+            self.started_at = datetime.now()
+            self.phases = OrderedDict()
+            self.timers = {}
+            self.counters = {}
+            self.histograms = {}
+            self.capture = None
+    
+    def count(self, name, value=1):
+        """Incrementa un contador"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def _add_sample(self, table, name, value):
+        entry = table.get(name)
+        if entry is None:
+            entry = {'count': 0, 'sum': 0.0, 'min': value, 'max': value,
+                     'buckets': [0] * (len(self.HISTOGRAM_BOUNDS) + 1)}
+            table[name] = entry
+        entry['count'] += 1
+        entry['sum'] += value
+        entry['min'] = min(entry['min'], value)
+        entry['max'] = max(entry['max'], value)
+        entry['buckets'][bisect.bisect_left(self.HISTOGRAM_BOUNDS, value)] += 1
+    
+    def observe(self, name, value):
+        """Agrega un valor al histograma indicado"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._add_sample(self.histograms, name, value)
+    
+    @contextmanager
+    def phase(self, name):
+        """Cronometra una fase completa del sistema"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.phases.setdefault(name, {'calls': 0, 'total_seconds': 0.0})
+                entry['calls'] += 1
+                entry['total_seconds'] += elapsed
+                entry['last_seconds'] = elapsed
+            logging.info(f"Fase '{name}' completada en {elapsed:.3f}s")
+    
+    def timed(self, name=None):
+        """Decorador que acumula la duración (ms) de cada llamada a la función"""
+        def decorator(func):
+            timer_name = name or func.__qualname__
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    with self._lock:
+                        self._add_sample(self.timers, timer_name, elapsed_ms)
+            return wrapper
+        return decorator
+    
+    def start_capture(self, profile=True, memory=True):
+        """Activa cProfile y/o tracemalloc hasta stop_capture()"""
+        if profile:
+            # Solo cubre este hilo; los sondeos del motor quedan en contadores e histogramas
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    
+    def stop_capture(self, top=20, profile_path=None):
+        """Detiene la captura y guarda las funciones y asignaciones más costosas"""
+        capture = {}
+        if self._profiler is not None:
+            self._profiler.disable()
+            if profile_path:
+                self._profiler.dump_stats(profile_path)
+                capture['profile_path'] = profile_path
+            stats = pstats.Stats(self._profiler, stream=io.StringIO())
+            functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+            capture['profile_top'] = [{
+                'function': f"{filename}:{line}({function})",
+                'calls': calls,
+                'total_seconds': round(total_time, 6),
+                'cumulative_seconds': round(cumulative_time, 6)
+            } for (filename, line, function), (_, calls, total_time, cumulative_time, _)
+                in functions[:top]]
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            capture['memory_current_kb'] = round(current / 1024, 1)
+            capture['memory_peak_kb'] = round(peak / 1024, 1)
+            capture['memory_top'] = [{
+                'location': str(stat.traceback[0]),
+                'size_kb': round(stat.size / 1024, 1),
+                'allocations': stat.count
+            } for stat in snapshot.statistics('lineno')[:top]]
+        with self._lock:
+            self.capture = capture
+        return capture
+    
+    def snapshot(self):
+        """Copia serializable de todas las mediciones"""
+        def with_mean(table):
+            return {name: dict(entry, mean=entry['sum'] / entry['count'] if entry['count'] else 0)
+                    for name, entry in table.items()}
+        
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(),
+                'taken_at': datetime.now().isoformat(),
+                'phases': {name: dict(entry) for name, entry in self.phases.items()},
+                'timers_ms': with_mean(self.timers),
+                'counters': dict(self.counters),
+                'histograms': with_mean(self.histograms),
+                'histogram_bounds': list(self.HISTOGRAM_BOUNDS),
+                'capture': self.capture
+            }
+    
+    def export(self, path):
+        """Guarda la instantánea de métricas en JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        logging.info(f"Métricas de instrumentación guardadas en {path}")
+        return path
+
+instrumentation = Instrumentation()
+
+class ProbeBackend(ABC):
+    """Interfaz de los backends de sondeo: cómo se mide un enlace"""
+    
+    @abstractmethod
+    def probe(self, source, target, timeout):
+        """Devuelve el RTT en segundos del enlace origen→destino, o None si se perdió"""
+    
+    def is_available(self, target, timeout=2):
+        """Indica si el destino responde"""
+        return self.probe(None, target, timeout) is not None
+
+class Ping3Backend(ProbeBackend):
+    """Sondeo real con ICMP (ping3) desde el equipo local; el origen se ignora"""
+    
+    def probe(self, source, target, timeout):
+        return ping(target, timeout=timeout) or None
+
+class SimulatedNetworkBackend(ProbeBackend):
+    """Red simulada y reproducible: latencia, jitter, pérdida y caídas por enlace"""
+    
+    def __init__(self, seed=0, extent_ms=100.0, base_latency_ms=1.0, jitter_fraction=0.1,
+                 loss_rate=0.01, outage_rate=0.01, outage_duration=300, links=None,
+                 clock=time.time):
+        self.seed = seed
+        self.extent_ms = extent_ms
+        self.base_latency_ms = base_latency_ms
+        self.jitter_fraction = jitter_fraction
+        self.loss_rate = loss_rate
+        self.outage_rate = outage_rate  # Probabilidad de que un enlace esté caído en cada periodo
+        self.outage_duration = outage_duration  # Duración de cada periodo (segundos)
+        self.clock = clock
+        self.link_overrides = {}
+        for (source, target), profile in (links or {}).items():
+            self.link_overrides[self._link_key(source, target)] = dict(profile)
+        self._profiles = {}
+        self._generators = {}
+        self._outages = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _node_hash(node):
+        return zlib.crc32(str(node).encode())
+    
+    def _link_key(self, source, target):
+        return tuple(sorted((str(source), str(target))))
+    
+    def node_position(self, node):
+        """Posición del nodo en el plano de latencias (ms); el equipo local está en el origen"""
+        if node is None:
+            return np.zeros(2)
+        rng = np.random.default_rng([self.seed, self._node_hash(node)])
+        return rng.uniform(0, self.extent_ms, 2)
+    
+    def link_profile(self, source, target):
+        """Latencia media, jitter y tasa de pérdida del enlace (simétrico)"""
+        key = self._link_key(source, target)
+        with self._lock:
+            profile = self._profiles.get(key)
+        if profile is not None:
+            return profile
+        
+        distance = np.linalg.norm(self.node_position(source) - self.node_position(target))
+        latency = self.base_latency_ms + distance
+        rng = np.random.default_rng([self.seed] + [self._node_hash(node) for node in key])
+        profile = {
+            'latency': float(latency),
+            'jitter': float(self.jitter_fraction * latency * rng.uniform(0.5, 1.5)),
+            'loss': float(min(1.0, rng.exponential(self.loss_rate))) if self.loss_rate > 0 else 0.0
+        }
+        profile.update(self.link_overrides.get(key, {}))
+        with self._lock:
+            self._profiles[key] = profile
+        return profile
+    
+    def is_down(self, source, target, now=None):
+        """Indica si el enlace origen→destino está en un periodo de caída"""
+        if self.outage_rate <= 0:
+            return False
+        now = self.clock() if now is None else now
+        period = int(now // self.outage_duration)
+        key = self._link_key(source, target)
+        cached = self._outages.get(key)
+        if cached is None or cached[0] != period:
+            rng = np.random.default_rng([self.seed, 2] + [self._node_hash(node) for node in key]
+                                        + [period])
+            cached = (period, rng.random() < self.outage_rate)
+            self._outages[key] = cached  # Un solo periodo por enlace
+        return cached[1]
+    
+    def probe(self, source, target, timeout):
+        if self.is_down(source, target):
+            return None
+        
+        profile = self.link_profile(source, target)
+        key = self._link_key(source, target)
+        with self._lock:
+            rng = self._generators.get(key)
+            if rng is None:
+                rng = np.random.default_rng([self.seed, 1] + [self._node_hash(node) for node in key])
+                self._generators[key] = rng
+            lost = rng.random() < profile['loss']
+            latency = rng.normal(profile['latency'], profile['jitter'])
+        
+        rtt = max(latency, 0.1 * profile['latency']) / 1000
+        if lost or rtt > timeout:
+            return None
+        return rtt
+
+class ConcurrentProbeEngine:
+    """Motor de sondeo concurrente con límite global y límite por destino"""
+    
+    def __init__(self, max_workers=32, per_target_limit=4, timeout=2, min_timeout=0.5,
+                 relative_precision=0.1, absolute_precision=1.0, confidence_z=1.96, backend=None):
+        self.backend = backend or Ping3Backend()
+        self.max_workers = max_workers
+        self.per_target_limit = per_target_limit
+        self.timeout = timeout  # Tope del timeout adaptativo (segundos)
+        self.min_timeout = min_timeout
+        self.relative_precision = relative_precision
+        self.absolute_precision = absolute_precision  # ms
+        self.confidence_z = confidence_z
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='probe')
+        self._target_semaphores = {}
+        self._semaphores_lock = threading.Lock()
+        self._rtt_stats = {}  # destino -> [srtt, rttvar, rto] en segundos
+        self._rtt_lock = threading.Lock()
+    
+    def _target_semaphore(self, target):
+        """Obtiene (o crea) el semáforo que limita los pings simultáneos a un destino"""
+        with self._semaphores_lock:
+            semaphore = self._target_semaphores.get(target)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_target_limit)
+                self._target_semaphores[target] = semaphore
+            return semaphore
+    
+    def target_timeout(self, target):
+        """Timeout actual de un destino según su historial de RTT"""
+        with self._rtt_lock:
+            stats = self._rtt_stats.get(target)
+            return self.timeout if stats is None else stats[2]
+    
+    def _update_rtt(self, target, rtt):
+        """Actualiza el RTT suavizado y su variación (estilo RFC 6298); None = muestra perdida"""
+        with self._rtt_lock:
+            stats = self._rtt_stats.get(target)
+            if rtt is None:
+                # Pérdida: se duplica el timeout hasta el tope, como el backoff de TCP
+                if stats is not None:
+                    stats[2] = min(self.timeout, stats[2] * 2)
+                return
+            if stats is None:
+                stats = [rtt, rtt / 2, self.timeout]
+                self._rtt_stats[target] = stats
+            else:
+                stats[1] = 0.75 * stats[1] + 0.25 * abs(stats[0] - rtt)
+                stats[0] = 0.875 * stats[0] + 0.125 * rtt
+            stats[2] = min(self.timeout, max(self.min_timeout, stats[0] + 4 * stats[1]))
+    
+    def _probe_once(self, source, target):
+        """Envía un sondeo y devuelve la latencia en ms o None si se perdió"""
+        with self._target_semaphore(target):
+            try:
+                instrumentation.count('probes_sent')
+                response_time = self.backend.probe(source, target, self.target_timeout(target))
+                self._update_rtt(target, response_time or None)
+                if response_time:
+                    instrumentation.observe('probe_rtt_ms', response_time * 1000)
+                    return response_time * 1000  # Conversión a ms
+                instrumentation.count('probe_timeouts')
+            except Exception as e:
+                instrumentation.count('probe_errors')
+                logging.error(f"Error pinging {target}: {e}")
+        return None
+    
+    def is_precise(self, latencies, sent):
+        """Indica si el intervalo de confianza de la latencia media ya es suficientemente estrecho"""
+        if not latencies:
+            # Todo perdido: insistir no aporta información sobre la latencia
+            return sent > 0
+        if len(latencies) < max(2, sent):
+            # Pérdidas parciales: la tasa de pérdida también necesita más muestras
+            return False
+        half_width = self.confidence_z * np.std(latencies, ddof=1) / np.sqrt(len(latencies))
+        return half_width <= max(self.relative_precision * np.mean(latencies),
+                                 self.absolute_precision)
+    
+    def probe_pairs(self, pairs, samples=10, min_samples=None):
+        """Sondea todos los pares a la vez y devuelve {par: {'latencies', 'sent'}}"""
+        pairs = list(dict.fromkeys(pairs))
+        min_samples = samples if min_samples is None else max(1, min(min_samples, samples))
+        results = {pair: {'latencies': [], 'sent': 0} for pair in pairs}
+        batch = {pair: min_samples for pair in pairs}
+        
+        # Con min_samples < samples, solo los pares aún imprecisos reciben más muestras
+        while batch:
+            futures = {pair: [] for pair in batch}
+            # Se envían en orden round-robin para repartir la carga entre destinos
+            for round_index in range(max(batch.values())):
+                for pair, count in batch.items():
+                    if round_index < count:
+                        futures[pair].append(self._executor.submit(self._probe_once, *pair))
+            
+            next_batch = {}
+            for pair, pair_futures in futures.items():
+                result = results[pair]
+                result['sent'] += len(pair_futures)
+                result['latencies'].extend(latency for latency in (f.result() for f in pair_futures)
+                                           if latency is not None)
+                remaining = samples - result['sent']
+                if remaining > 0 and not self.is_precise(result['latencies'], result['sent']):
+                    next_batch[pair] = min(result['sent'], remaining)
+            batch = next_batch
+        return results
+    
+    def _check_once(self, target, timeout):
+        """Chequeo de salud de un destino respetando su límite de concurrencia"""
+        with self._target_semaphore(target):
+            try:
+                return bool(self.backend.is_available(target, timeout=timeout))
+            except Exception:
+                return False
+    
+    def check_availability(self, targets, timeout=2):
+        """Chequea los destinos en paralelo y produce (destino, disponible) según terminan"""
+        futures = {self._executor.submit(self._check_once, target, timeout): target
+                   for target in dict.fromkeys(targets)}
+        for future in as_completed(futures):
+            if not future.cancelled():
+                yield futures[future], future.result()
+    
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Libera los hilos del motor de sondeo, descartando opcionalmente los sondeos en cola"""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+class AvailabilityMonitor:
+    """Planificador en segundo plano con ventana móvil de disponibilidad por destino"""
+    
+    def __init__(self, health_check, check_interval=300, window_size=12):
+        self.health_check = health_check  # destinos -> iterable de (destino, disponible)
+        self.check_interval = check_interval  # 5 minutos entre checks
+        self.window_size = window_size
+        self._windows = {}
+        self._successes = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def add_target(self, target, window_size=None):
+        """Registra un destino para que sea verificado periódicamente"""
+        with self._lock:
+            if target not in self._windows:
+                self._windows[target] = deque(maxlen=window_size or self.window_size)
+                self._successes[target] = 0
+    
+    def record(self, target, is_available):
+        """Agrega el resultado de un chequeo a la ventana del destino en O(1)"""
+        self.add_target(target)
+        with self._lock:
+            window = self._windows[target]
+            if len(window) == window.maxlen and window[0]:
+                self._successes[target] -= 1
+            window.append(bool(is_available))
+            if is_available:
+                self._successes[target] += 1
+    
+    def get_availability(self, target):
+        """Devuelve el porcentaje de disponibilidad actual o None si no hay chequeos"""
+        with self._lock:
+            window = self._windows.get(target)
+            if not window:
+                return None
+            return (self._successes[target] / len(window)) * 100
+    
+    def check_now(self):
+        """Ejecuta un chequeo de salud sobre todos los destinos registrados"""
+        with self._lock:
+            targets = list(self._windows)
+        for target, is_available in self.health_check(targets):
+            if self._stop_event.is_set():
+                break
+            self.record(target, is_available)
+    
+    def start(self):
+        """Inicia el hilo de chequeos periódicos"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='availability-monitor',
+                                        daemon=True)
+        self._thread.start()
+    
+    def stop(self, wait=True):
+        """Detiene el hilo de chequeos periódicos"""
+        self._stop_event.set()
+        if self._thread and wait:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.check_now()
+            self._stop_event.wait(self.check_interval)
+
 class NetworkMetricsCollector:
     """Módulo para recopilar métricas de red entre servidores"""
     
-    def __init__(self, servers_config):
+    def __init__(self, servers_config, probe_engine=None, min_samples=3):
         self.servers = servers_config
         self.metrics_buffer = []
+        self.probe_engine = probe_engine or ConcurrentProbeEngine()
+        self.min_samples = min_samples  # Muestras antes de decidir si hacen falta más
+        self.availability_monitor = AvailabilityMonitor(self.check_targets)
         
     def collect_latency(self, source, target, samples=10):
         """Mide latencia promedio mediante múltiples pings"""
-        latencies = []
-        for _ in range(samples):
-            try:
-                response_time = ping(target, timeout=2)
-                if response_time:
-                    latencies.append(response_time * 1000)  # Conversión a ms
-            except Exception as e:
-                self.log_error(f"Error pinging {target}: {e}")
-        
+        return self.collect_latency_batch([(source, target)], samples)[(source, target)]
+    
+    def collect_latency_batch(self, pairs, samples=10):
+        """Mide la latencia de varios pares en paralelo (samples es el máximo por par)"""
+        results = self.probe_engine.probe_pairs(pairs, samples, min_samples=self.min_samples)
+        return {pair: self.summarize_latencies(result['latencies'], result['sent'])
+                for pair, result in results.items()}
+    
+    def summarize_latencies(self, latencies, samples):
+        """Resume una lista de latencias en promedio, desviación y pérdida"""
         return {
             'avg_latency': np.mean(latencies) if latencies else None,
             'std_latency': np.std(latencies) if latencies else None,
@@ -53,65 +533,233 @@ class NetworkMetricsCollector:
     
     def measure_availability(self, target, duration_hours=1):
         """Evalúa disponibilidad del servicio en ventana temporal"""
-        successful_checks = 0
         total_checks = max(1, int(duration_hours * 12))  # Checks cada 5 minutos
+        self.availability_monitor.add_target(target, window_size=total_checks)
         
-        for _ in range(total_checks):
-            if self.service_health_check(target):
-                successful_checks += 1
-            if total_checks > 1:
-                time.sleep(300)  # 5 minutos entre checks
+        availability = self.availability_monitor.get_availability(target)
+        if availability is None:
+            # Sin historial todavía: un chequeo inmediato inicializa la ventana
+            self.availability_monitor.record(target, self.service_health_check(target))
+            availability = self.availability_monitor.get_availability(target)
         
-        return (successful_checks / total_checks) * 100
+        return availability
+    
+    def seed_availability(self, targets, duration_hours=1):
+        """Registra los destinos y hace en paralelo el primer chequeo de los que no tienen historial"""
+        monitor = self.availability_monitor
+        total_checks = max(1, int(duration_hours * 12))
+        for target in targets:
+            monitor.add_target(target, window_size=total_checks)
+        pending = [target for target in targets if monitor.get_availability(target) is None]
+        for target, is_available in self.check_targets(pending):
+            monitor.record(target, is_available)
+    
+    def check_targets(self, targets):
+        """Chequeo de salud concurrente de varios destinos"""
+        return self.probe_engine.check_availability(targets, timeout=2)
     
     def service_health_check(self, target):
         """Verifica si el servicio está disponible"""
         try:
-            response_time = ping(target, timeout=2)
-            return response_time is not None
+            return self.probe_engine.backend.is_available(target, timeout=2)
         except:
             return False
     
     def log_error(self, message):
         logging.error(message)
 
+class LatencyCoordinates:
+    """Coordenadas de red (estilo Vivaldi) para estimar latencias de enlaces no medidos"""
+    
+    def __init__(self, nodes, dimensions=3, seed=0):
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        rng = np.random.default_rng(seed)
+        self.positions = rng.normal(scale=1.0, size=(len(self.nodes), dimensions))
+        self.heights = np.zeros(len(self.nodes))  # Componente de acceso de cada nodo
+    
+    def fit(self, pairs, latencies, iterations=200, learning_rate=0.1):
+        """Ajusta las coordenadas a las latencias medidas por descenso de gradiente vectorizado"""
+        if not pairs:
+            return self
+        i = np.array([self.node_index[a] for a, _ in pairs])
+        j = np.array([self.node_index[b] for _, b in pairs])
+        latencies = np.asarray(latencies, dtype=float)
+        
+        # Escala inicial acorde a las latencias observadas
+        scale = np.median(latencies) / max(np.median(self._distances(i, j)), 1e-9)
+        self.positions *= scale
+        degree = np.maximum(np.bincount(np.concatenate([i, j]), minlength=len(self.nodes)), 1)
+        
+        for _ in range(iterations):
+            difference = self.positions[i] - self.positions[j]
+            distance = np.maximum(np.linalg.norm(difference, axis=1), 1e-9)
+            error = distance + self.heights[i] + self.heights[j] - latencies
+            
+            gradient = (error / distance)[:, np.newaxis] * difference
+            position_step = np.zeros_like(self.positions)
+            np.add.at(position_step, i, gradient)
+            np.add.at(position_step, j, -gradient)
+            height_step = np.bincount(i, weights=error, minlength=len(self.nodes))
+            height_step += np.bincount(j, weights=error, minlength=len(self.nodes))
+            
+            self.positions -= learning_rate * position_step / degree[:, np.newaxis]
+            self.heights = np.maximum(self.heights - learning_rate * height_step / degree, 0.0)
+        return self
+    
+    def _distances(self, i, j):
+        return np.linalg.norm(self.positions[i] - self.positions[j], axis=1)
+    
+    def estimate(self, pairs):
+        """Latencias estimadas para una lista de pares"""
+        i = np.array([self.node_index[a] for a, _ in pairs], dtype=np.intp)
+        j = np.array([self.node_index[b] for _, b in pairs], dtype=np.intp)
+        return self._distances(i, j) + self.heights[i] + self.heights[j]
+
+class ProbeScheduler:
+    """Elige qué pares medir en cada ciclo según antigüedad, varianza y criticidad"""
+    
+    def __init__(self, pairs, budget_fraction=0.2, min_budget=1, max_staleness_cycles=10,
+                 staleness_weight=1.0, variance_weight=1.0, criticality_weight=1.0,
+                 smoothing=0.3):
+        self.pairs = list(pairs)
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        for i, (a, b) in enumerate(self.pairs):
+            self.pair_index.setdefault((b, a), i)
+        self.budget = max(min_budget, int(np.ceil(budget_fraction * len(self.pairs))))
+        self.max_staleness_cycles = max_staleness_cycles
+        self.staleness_weight = staleness_weight
+        self.variance_weight = variance_weight
+        self.criticality_weight = criticality_weight
+        self.smoothing = smoothing
+        
+        pair_count = len(self.pairs)
+        self.cycle = 0
+        self.last_probed = np.full(pair_count, -np.inf)
+        self.latency_mean = np.full(pair_count, np.nan)
+        self.latency_variance = np.zeros(pair_count)
+        self.criticality = np.zeros(pair_count)
+        self.probes_sent = 0
+    
+    def select(self):
+        """Pares a medir en el ciclo actual"""
+        self.cycle += 1
+        staleness = self.cycle - self.last_probed
+        
+        # Nunca medidos o demasiado antiguos: se miden sí o sí
+        forced = staleness >= self.max_staleness_cycles
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variation = np.sqrt(self.latency_variance) / self.latency_mean
+        variation = np.nan_to_num(variation, nan=1.0, posinf=1.0)
+        max_criticality = self.criticality.max() if self.criticality.size else 0
+        criticality = self.criticality / max_criticality if max_criticality > 0 else self.criticality
+        
+        priority = (self.staleness_weight * np.minimum(staleness, self.max_staleness_cycles)
+                    / self.max_staleness_cycles
+                    + self.variance_weight * np.minimum(variation, 1.0)
+                    + self.criticality_weight * criticality)
+        # Los forzados van por delante del resto, y entre ellos los más antiguos primero
+        priority[forced] = priority[~forced].max(initial=0) + staleness[forced]
+        
+        budget = min(self.budget, len(self.pairs))
+        if budget >= len(self.pairs):
+            chosen = np.arange(len(self.pairs))
+        else:
+            chosen = np.argpartition(-priority, budget - 1)[:budget]
+        return [self.pairs[i] for i in np.sort(chosen)]
+    
+    def record(self, probed_pairs, latencies):
+        """Registra los resultados de un ciclo ({par: latencia o None})"""
+        for pair in probed_pairs:
+            i = self.pair_index[pair]
+            self.last_probed[i] = self.cycle
+            self.probes_sent += 1
+            latency = latencies.get(pair)
+            if latency is None:
+                continue
+            
+            # Media y varianza exponenciales de la latencia
+            if np.isnan(self.latency_mean[i]):
+                self.latency_mean[i] = latency
+                continue
+            delta = latency - self.latency_mean[i]
+            self.latency_mean[i] += self.smoothing * delta
+            self.latency_variance[i] = (1 - self.smoothing) * (self.latency_variance[i]
+                                                               + self.smoothing * delta ** 2)
+    
+    def update_criticality(self, routes):
+        """Cuenta cuántas rutas óptimas usan cada enlace"""
+        self.criticality[:] = 0
+        for route in routes.values():
+            path = route['path']
+            for hop in zip(path[:-1], path[1:]):
+                i = self.pair_index.get(hop)
+                if i is not None:
+                    self.criticality[i] += 1
+
 class FuzzyNetworkEvaluator:
     """Módulo de evaluación de calidad de enlace usando lógica difusa"""
     
     def __init__(self):
+        self.lookup_table = None
         self.setup_membership_functions()
     
+    def enable_lookup_table(self, resolution=(2.0, 0.5, 0.25), max_error=0.25):
+        """Activa la tabla precalculada de pesos (latencia × disponibilidad × pérdida)"""
+        self.lookup_table = FuzzyWeightLookupTable(self, resolution, max_error)
+        return self.lookup_table
+    
+    def disable_lookup_table(self):
+        """Vuelve a la inferencia difusa exacta"""
+        self.lookup_table = None
+    
     def setup_membership_functions(self):
         """Define funciones de pertenencia para cada métrica"""
+        # Universos de discurso (se construyen una sola vez)
+        self.latency_universe = np.arange(0, 201, 1)
+        self.availability_universe = np.arange(0, 101, 1)
+        self.packet_loss_universe = np.arange(0, 11, 1)
+        
         # Latencia: Baja, Media, Alta
-        self.latency_low = fuzz.trimf(np.arange(0, 201, 1), [0, 0, 100])
-        self.latency_medium = fuzz.trimf(np.arange(0, 201, 1), [50, 100, 150])
-        self.latency_high = fuzz.trimf(np.arange(0, 201, 1), [100, 200, 200])
+        self.latency_low = fuzz.trimf(self.latency_universe, [0, 0, 100])
+        self.latency_medium = fuzz.trimf(self.latency_universe, [50, 100, 150])
+        self.latency_high = fuzz.trimf(self.latency_universe, [100, 200, 200])
         
         # Disponibilidad: Baja, Media, Alta
-        self.availability_low = fuzz.trimf(np.arange(0, 101, 1), [0, 0, 95])
-        self.availability_medium = fuzz.trimf(np.arange(0, 101, 1), [90, 95, 99])
-        self.availability_high = fuzz.trimf(np.arange(0, 101, 1), [95, 100, 100])
+        self.availability_low = fuzz.trimf(self.availability_universe, [0, 0, 95])
+        self.availability_medium = fuzz.trimf(self.availability_universe, [90, 95, 99])
+        self.availability_high = fuzz.trimf(self.availability_universe, [95, 100, 100])
         
         # Pérdida de paquetes: Baja, Media, Alta
-        self.packet_loss_low = fuzz.trimf(np.arange(0, 11, 1), [0, 0, 2])
-        self.packet_loss_medium = fuzz.trimf(np.arange(0, 11, 1), [1, 3, 5])
-        self.packet_loss_high = fuzz.trimf(np.arange(0, 11, 1), [3, 10, 10])
+        self.packet_loss_low = fuzz.trimf(self.packet_loss_universe, [0, 0, 2])
+        self.packet_loss_medium = fuzz.trimf(self.packet_loss_universe, [1, 3, 5])
+        self.packet_loss_high = fuzz.trimf(self.packet_loss_universe, [3, 10, 10])
+        
+        # Calidad del enlace (conjuntos de salida)
+        self.quality_range = np.arange(0, 11, 1)
+        self.quality_excellent = fuzz.trimf(self.quality_range, [7, 10, 10])
+        self.quality_good = fuzz.trimf(self.quality_range, [4, 7, 10])
+        self.quality_poor = fuzz.trimf(self.quality_range, [0, 3, 6])
     
     def evaluate_link_quality(self, latency, availability, packet_loss):
         """Calcula calidad del enlace usando inferencia difusa"""
+        instrumentation.count('fuzzy_evaluations')
+        if self.lookup_table is not None:
+            return float(self.lookup_table.lookup(latency, availability, packet_loss)[0])
+        
         # Fuzzificación
-        lat_low = fuzz.interp_membership(np.arange(0, 201, 1), self.latency_low, latency)
-        lat_med = fuzz.interp_membership(np.arange(0, 201, 1), self.latency_medium, latency)
-        lat_high = fuzz.interp_membership(np.arange(0, 201, 1), self.latency_high, latency)
+        lat_low = fuzz.interp_membership(self.latency_universe, self.latency_low, latency)
+        lat_med = fuzz.interp_membership(self.latency_universe, self.latency_medium, latency)
+        lat_high = fuzz.interp_membership(self.latency_universe, self.latency_high, latency)
         
-        avail_low = fuzz.interp_membership(np.arange(0, 101, 1), self.availability_low, availability)
-        avail_med = fuzz.interp_membership(np.arange(0, 101, 1), self.availability_medium, availability)
-        avail_high = fuzz.interp_membership(np.arange(0, 101, 1), self.availability_high, availability)
+        avail_low = fuzz.interp_membership(self.availability_universe, self.availability_low, availability)
+        avail_med = fuzz.interp_membership(self.availability_universe, self.availability_medium, availability)
+        avail_high = fuzz.interp_membership(self.availability_universe, self.availability_high, availability)
         
-        loss_low = fuzz.interp_membership(np.arange(0, 11, 1), self.packet_loss_low, packet_loss)
-        loss_med = fuzz.interp_membership(np.arange(0, 11, 1), self.packet_loss_medium, packet_loss)
-        loss_high = fuzz.interp_membership(np.arange(0, 11, 1), self.packet_loss_high, packet_loss)
+        loss_low = fuzz.interp_membership(self.packet_loss_universe, self.packet_loss_low, packet_loss)
+        loss_med = fuzz.interp_membership(self.packet_loss_universe, self.packet_loss_medium, packet_loss)
+        loss_high = fuzz.interp_membership(self.packet_loss_universe, self.packet_loss_high, packet_loss)
         
         # Reglas de inferencia
         rule1 = np.fmin(np.fmin(lat_low, avail_high), loss_low)  # Calidad Excelente
@@ -119,126 +767,1413 @@ class FuzzyNetworkEvaluator:
         rule3 = np.fmax(np.fmax(lat_high, avail_low), loss_high) # Calidad Pobre
         
         # Defuzzificación (método del centroide)
-        quality_range = np.arange(0, 11, 1)
-        quality_excellent = fuzz.trimf(quality_range, [7, 10, 10])
-        quality_good = fuzz.trimf(quality_range, [4, 7, 10])
-        quality_poor = fuzz.trimf(quality_range, [0, 3, 6])
-        
         aggregated = np.fmax(np.fmax(
-            np.fmin(rule1, quality_excellent),
-            np.fmin(rule2, quality_good)),
-            np.fmin(rule3, quality_poor))
+            np.fmin(rule1, self.quality_excellent),
+            np.fmin(rule2, self.quality_good)),
+            np.fmin(rule3, self.quality_poor))
         
-        quality_score = fuzz.defuzz(quality_range, aggregated, 'centroid')
+        # Sin reglas activas el enlace recibe el peso máximo (igual que en el cálculo por lotes)
+        if aggregated.any():
+            quality_score = fuzz.defuzz(self.quality_range, aggregated, 'centroid')
+        else:
+            quality_score = 0
         
         # Conversión a peso (menor calidad = mayor peso para Dijkstra)
         return max(1, 11 - quality_score)
+    
+    @instrumentation.timed()
+    def evaluate_link_quality_batch(self, latencies, availabilities, packet_losses, exact=False):
+        """Calcula los pesos de muchos enlaces en una sola pasada vectorizada"""
+        latencies = np.atleast_1d(np.asarray(latencies, dtype=float))
+        instrumentation.count('fuzzy_evaluations', np.size(latencies))
+        if self.lookup_table is not None and not exact:
+            return self.lookup_table.lookup(latencies, availabilities, packet_losses)
+        return self.infer_batch(latencies, availabilities, packet_losses)
+    
+    def infer_batch(self, latencies, availabilities, packet_losses):
+        """Inferencia exacta por lotes (sin tabla ni contadores; la usa también la tabla)"""
+        latencies = np.atleast_1d(np.asarray(latencies, dtype=float))
+        availabilities = np.atleast_1d(np.asarray(availabilities, dtype=float))
+        packet_losses = np.atleast_1d(np.asarray(packet_losses, dtype=float))
+        
+        # Fuzzificación (equivalente a interp_membership, cero fuera del universo)
+        def membership(universe, mf, values):
+            return np.interp(values, universe, mf, left=0.0, right=0.0)
+        
+        lat_low = membership(self.latency_universe, self.latency_low, latencies)
+        lat_med = membership(self.latency_universe, self.latency_medium, latencies)
+        lat_high = membership(self.latency_universe, self.latency_high, latencies)
+        
+        avail_low = membership(self.availability_universe, self.availability_low, availabilities)
+        avail_med = membership(self.availability_universe, self.availability_medium, availabilities)
+        avail_high = membership(self.availability_universe, self.availability_high, availabilities)
+        
+        loss_low = membership(self.packet_loss_universe, self.packet_loss_low, packet_losses)
+        loss_high = membership(self.packet_loss_universe, self.packet_loss_high, packet_losses)
+        
+        # Reglas de inferencia, una fila por enlace
+        rule1 = np.fmin(np.fmin(lat_low, avail_high), loss_low)[:, np.newaxis]
+        rule2 = np.fmin(np.fmin(lat_med, avail_med), loss_low)[:, np.newaxis]
+        rule3 = np.fmax(np.fmax(lat_high, avail_low), loss_high)[:, np.newaxis]
+        
+        aggregated = np.fmax(np.fmax(
+            np.fmin(rule1, self.quality_excellent),
+            np.fmin(rule2, self.quality_good)),
+            np.fmin(rule3, self.quality_poor))
+        
+        # Centroide exacto de la función lineal por tramos (mismo cálculo que fuzz.defuzz)
+        x = self.quality_range.astype(float)
+        x1, dx = x[:-1], np.diff(x)
+        y1, y2 = aggregated[:, :-1], aggregated[:, 1:]
+        area = 0.5 * dx * (y1 + y2)
+        moment = dx * (x1 * 0.5 * (y1 + y2) + dx * (y1 + 2 * y2) / 6.0)
+        sum_area = area.sum(axis=1)
+        
+        # Sin reglas activas el centroide vale 0: el enlace recibe el peso máximo
+        quality_scores = moment.sum(axis=1) / np.fmax(sum_area, np.finfo(float).eps)
+        
+        return np.maximum(1, 11 - quality_scores)
+
+class FuzzyWeightLookupTable:
+    """Rejilla 3-D precalculada de pesos difusos con interpolación trilineal"""
+    
+    def __init__(self, evaluator, resolution=(2.0, 0.5, 0.25), max_error=0.25,
+                 validation_samples=5000, chunk_size=100000):
+        self.evaluator = evaluator
+        self.resolution = tuple(float(step) for step in resolution)
+        self.max_error = max_error
+        
+        # Ejes de la rejilla sobre los universos de discurso
+        universes = (evaluator.latency_universe, evaluator.availability_universe,
+                     evaluator.packet_loss_universe)
+        self.axes = []
+        for universe, step in zip(universes, self.resolution):
+            low, high = float(universe[0]), float(universe[-1])
+            points = int(round((high - low) / step)) + 1
+            self.axes.append(np.linspace(low, high, points))
+        self.starts = np.array([axis[0] for axis in self.axes])
+        self.steps = np.array([axis[1] - axis[0] for axis in self.axes])
+        self.shape = tuple(len(axis) for axis in self.axes)
+        
+        # Evaluación exacta de todos los nodos de la rejilla, por bloques
+        lat, avail, loss = np.meshgrid(*self.axes, indexing='ij')
+        lat, avail, loss = lat.ravel(), avail.ravel(), loss.ravel()
+        weights = np.empty(lat.size)
+        for start in range(0, lat.size, chunk_size):
+            block = slice(start, start + chunk_size)
+            weights[block] = evaluator.infer_batch(lat[block], avail[block], loss[block])
+        self.weights = weights.reshape(self.shape)
+        
+        # Celdas cuyo rango de pesos supera la cota se resuelven con inferencia exacta
+        corners = [self.weights[i:i + self.shape[0] - 1,
+                                j:j + self.shape[1] - 1,
+                                k:k + self.shape[2] - 1]
+                   for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+        spread = np.max(corners, axis=0) - np.min(corners, axis=0)
+        self.exact_cells = spread > max_error
+        
+        self.max_observed_error = self.validate(validation_samples)
+        if self.max_observed_error > max_error:
+            raise ValueError(f"La tabla de pesos excede la cota de error: "
+                             f"{self.max_observed_error:.4f} > {max_error}; "
+                             f"use una resolución más fina")
+        
+        logging.info(f"Tabla de pesos difusos creada: {self.weights.size} nodos, "
+                     f"{self.exact_cells.mean() * 100:.1f}% de celdas exactas, "
+                     f"error máximo observado {self.max_observed_error:.4f}")
+    
+    def lookup(self, latencies, availabilities, packet_losses):
+        """Obtiene pesos interpolados para arreglos de métricas"""
+        values = np.stack(np.broadcast_arrays(
+            np.atleast_1d(np.asarray(latencies, dtype=float)),
+            np.atleast_1d(np.asarray(availabilities, dtype=float)),
+            np.atleast_1d(np.asarray(packet_losses, dtype=float))))
+        
+        # Índice de celda y posición fraccionaria dentro de ella
+        position = (values - self.starts[:, np.newaxis]) / self.steps[:, np.newaxis]
+        limits = np.array(self.shape)[:, np.newaxis] - 1
+        inside = np.all((position >= 0) & (position <= limits), axis=0)
+        cell = np.clip(np.floor(np.nan_to_num(position)), 0, limits - 1).astype(np.intp)
+        fraction = np.clip(np.nan_to_num(position) - cell, 0.0, 1.0)
+        ti, tj, tk = fraction
+        
+        # Interpolación trilineal sobre índices planos de la rejilla
+        w = self.weights.ravel()
+        stride_i, stride_j = self.shape[1] * self.shape[2], self.shape[2]
+        base = np.ravel_multi_index(cell, self.shape)
+        c00 = w.take(base) * (1 - ti) + w.take(base + stride_i) * ti
+        c01 = w.take(base + 1) * (1 - ti) + w.take(base + stride_i + 1) * ti
+        c10 = w.take(base + stride_j) * (1 - ti) + w.take(base + stride_i + stride_j) * ti
+        c11 = (w.take(base + stride_j + 1) * (1 - ti)
+               + w.take(base + stride_i + stride_j + 1) * ti)
+        c0 = c00 * (1 - tj) + c10 * tj
+        c1 = c01 * (1 - tj) + c11 * tj
+        result = c0 * (1 - tk) + c1 * tk
+        
+        # Fuera del universo o en celdas discontinuas se usa la inferencia exacta
+        exact = ~inside | self.exact_cells[tuple(cell)]
+        if exact.any():
+            result[exact] = self.evaluator.infer_batch(
+                values[0, exact], values[1, exact], values[2, exact])
+        
+        return result
+    
+    def validate(self, samples=5000, seed=0):
+        """Mide el error máximo de la tabla contra el centroide exacto"""
+        if samples <= 0:
+            return 0.0
+        rng = np.random.default_rng(seed)
+        points = [rng.uniform(axis[0], axis[-1], samples) for axis in self.axes]
+        approximate = self.lookup(*points)
+        exact = self.evaluator.infer_batch(*points)
+        return float(np.max(np.abs(approximate - exact)))
+
+class RouteCache:
+    """Caché LRU de rutas con invalidación por dependencia de aristas"""
+    
+    # Entradas por par ordenado de nodos: ruta óptima y alternativas
+    ENTRIES_PER_PAIR = 2
+    
+    def __init__(self, maxsize=100000, directed=False):
+        self.maxsize = maxsize
+        self.directed = directed
+        self._entries = OrderedDict()  # clave -> (valor, aristas, cota de peso)
+        self._edge_index = {}          # arista -> claves que dependen de ella
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def _edge_key(self, u, v):
+        return (u, v) if self.directed else frozenset((u, v))
+    
+    @classmethod
+    def _copy(cls, value):
+        # Se copia al guardar y al devolver: anotar una ruta no altera la entrada en caché.
+        # Copia por niveles de dicts y listas (las rutas no anidan otros tipos mutables)
+        if isinstance(value, dict):
+            return {key: cls._copy(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._copy(item) for item in value]
+        return value
+    
+    def resize_for_nodes(self, node_count, minimum=100000):
+        """Ajusta la capacidad para que quepan todas las rutas de node_count nodos"""
+        self.maxsize = max(minimum, self.ENTRIES_PER_PAIR * node_count * (node_count - 1))
+        self._evict()
+    
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            oldest_key = next(iter(self._entries))
+            self._discard(oldest_key)
+            self.evictions += 1
+    
+    def get(self, key):
+        """Devuelve la entrada (y la marca como reciente) o None si no existe"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._copy(entry[0])
+    
+    def put(self, key, value, paths, weight_bound):
+        """Guarda una entrada junto con las aristas de las rutas de las que depende"""
+        if key in self._entries:
+            self._discard(key)
+        
+        edges = {self._edge_key(path[i], path[i + 1])
+                 for path in paths for i in range(len(path) - 1)}
+        self._entries[key] = (self._copy(value), edges, weight_bound)
+        for edge in edges:
+            self._edge_index.setdefault(edge, set()).add(key)
+        self._evict()
+    
+    def _discard(self, key):
+        _, edges, _ = self._entries.pop(key)
+        for edge in edges:
+            dependents = self._edge_index.get(edge)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._edge_index[edge]
+    
+    def invalidate(self, key):
+        """Elimina una entrada concreta"""
+        if key in self._entries:
+            self._discard(key)
+            self.invalidations += 1
+    
+    def invalidate_edges(self, edges):
+        """Elimina solo las entradas cuyas rutas usan alguna de las aristas dadas"""
+        affected = set()
+        for u, v in edges:
+            affected.update(self._edge_index.get(self._edge_key(u, v), ()))
+        for key in affected:
+            self.invalidate(key)
+        return len(affected)
+    
+    def entries(self):
+        """Itera (clave, valor, cota de peso) sin alterar el orden LRU ni los contadores"""
+        for key, (value, _, weight_bound) in list(self._entries.items()):
+            yield key, value, weight_bound
+    
+    def clear(self):
+        self._entries.clear()
+        self._edge_index.clear()
+    
+    def stats(self):
+        """Contadores para monitoreo"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+    
+    def __contains__(self, key):
+        return key in self._entries
+    
+    def __len__(self):
+        return len(self._entries)
+
+def _notify_on(*method_names):
+    """Decorador de clase: los métodos indicados avisan de cada modificación con _touch()"""
+    def notifying(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._touch()
+        return wrapper
+    
+    def decorate(cls):
+        for name in method_names:
+            setattr(cls, name, notifying(getattr(cls, name)))
+        return cls
+    return decorate
+
+@_notify_on('__setitem__', '__delitem__', '__ior__', 'update', 'pop', 'popitem',
+            'setdefault', 'clear')
+class ObservedEdgeData(dict):
+    """Atributos de una arista que hacen avanzar la versión de su grafo al cambiar"""
+    
+    __slots__ = ('_graph',)
+    
+    def __init__(self, graph):
+        super().__init__()
+        self._graph = graph
+    
+    def _touch(self):
+        graph = getattr(self, '_graph', None)  # Aún sin asignar al deserializar
+        if graph is not None:
+            graph.version += 1
+
+_GRAPH_MUTATORS = ('add_node', 'add_nodes_from', 'remove_node', 'remove_nodes_from',
+                   'add_edge', 'add_edges_from', 'add_weighted_edges_from', 'remove_edge',
+                   'remove_edges_from', 'update', 'clear', 'clear_edges')
+
+class ObservedGraphMixin:
+    """Grafo de networkx con una versión que avanza con cada cambio de nodos, aristas o atributos"""
+    
+    version = 0
+    
+    def edge_attr_dict_factory(self):
+        return ObservedEdgeData(self)
+    
+    def _touch(self):
+        self.version += 1
+
+@_notify_on(*_GRAPH_MUTATORS)
+class ObservedGraph(ObservedGraphMixin, nx.Graph):
+    """Grafo no dirigido observable"""
+
+@_notify_on(*_GRAPH_MUTATORS)
+class ObservedDiGraph(ObservedGraphMixin, nx.DiGraph):
+    """Grafo dirigido observable"""
+
+class CompactGraph:
+    """Grafo compacto en formato CSR con nodos indexados y columnas tipadas por arista"""
+    
+    def __init__(self, node_names, sources, targets, weight, latency, availability,
+                 packet_loss, directed=False, estimated_latency=None):
+        self.node_names = list(node_names)
+        self.node_index = {name: i for i, name in enumerate(self.node_names)}
+        self.directed = directed
+        
+        # Columnas por arista lógica
+        self.edge_sources = np.asarray(sources, dtype=np.int32)
+        self.edge_targets = np.asarray(targets, dtype=np.int32)
+        self.weight = np.asarray(weight, dtype=np.float64)
+        # float64, como los atributos del grafo: las métricas coinciden con networkx
+        self.latency = np.asarray(latency, dtype=np.float64)
+        self.availability = np.asarray(availability, dtype=np.float64)
+        self.packet_loss = np.asarray(packet_loss, dtype=np.float64)
+        # Latencia prevista por el modelo (por defecto, la medida)
+        self.estimated_latency = (self.latency.copy() if estimated_latency is None
+                                  else np.asarray(estimated_latency, dtype=np.float64))
+        
+        # Adyacencia CSR (ambos sentidos en grafos no dirigidos)
+        edge_ids = np.arange(len(self.weight), dtype=np.int32)
+        if directed:
+            rows, cols, ids = self.edge_sources, self.edge_targets, edge_ids
+        else:
+            rows = np.concatenate([self.edge_sources, self.edge_targets])
+            cols = np.concatenate([self.edge_targets, self.edge_sources])
+            ids = np.concatenate([edge_ids, edge_ids])
+        order = np.lexsort((cols, rows))
+        node_count = len(self.node_names)
+        self.indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=node_count), out=self.indptr[1:])
+        self.indices = cols[order].astype(np.int32)
+        self.adjacency_edge_ids = ids[order]
+        
+        # Claves ordenadas (fila * n + columna) para localizar aristas en bloque
+        self._adjacency_keys = rows[order].astype(np.int64) * node_count + self.indices
+        self._matrix = None
+    
+    @classmethod
+    def from_networkx(cls, graph, weight='weight'):
+        """Convierte un grafo de networkx al formato compacto"""
+        node_names = list(graph.nodes)
+        node_index = {name: i for i, name in enumerate(node_names)}
+        edge_count = graph.number_of_edges()
+        
+        sources = np.empty(edge_count, dtype=np.int32)
+        targets = np.empty(edge_count, dtype=np.int32)
+        columns = {name: np.empty(edge_count) for name in
+                   (weight, 'latency', 'availability', 'packet_loss')}
+        estimated_latency = np.empty(edge_count)
+        for position, (u, v, data) in enumerate(graph.edges(data=True)):
+            sources[position] = node_index[u]
+            targets[position] = node_index[v]
+            for name, column in columns.items():
+                column[position] = data.get(name, 1 if name == weight else 0)
+            estimated_latency[position] = data.get('estimated_latency', columns['latency'][position])
+        
+        return cls(node_names, sources, targets, columns[weight], columns['latency'],
+                   columns['availability'], columns['packet_loss'],
+                   directed=graph.is_directed(), estimated_latency=estimated_latency)
+    
+    def to_networkx(self):
+        """Reconstruye el grafo de networkx equivalente"""
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        graph.add_nodes_from(self.node_names)
+        names = self.node_names
+        graph.add_edges_from(
+            (names[u], names[v], {'weight': float(w), 'latency': float(lat),
+                                  'estimated_latency': float(estimated),
+                                  'availability': float(avail), 'packet_loss': float(loss)})
+            for u, v, w, lat, estimated, avail, loss in zip(
+                self.edge_sources, self.edge_targets, self.weight, self.latency,
+                self.estimated_latency, self.availability, self.packet_loss))
+        return graph
+    
+    def number_of_nodes(self):
+        return len(self.node_names)
+    
+    def number_of_edges(self):
+        return len(self.weight)
+    
+    def nbytes(self):
+        """Memoria ocupada por los arreglos del grafo (sin índice de nombres)"""
+        arrays = (self.edge_sources, self.edge_targets, self.weight, self.latency,
+                  self.estimated_latency, self.availability, self.packet_loss,
+                  self.indptr, self.indices,
+                  self.adjacency_edge_ids, self._adjacency_keys)
+        return sum(array.nbytes for array in arrays)
+    
+    def weight_matrix(self):
+        """Matriz dispersa de pesos usada por Dijkstra"""
+        if self._matrix is None:
+            node_count = len(self.node_names)
+            self._matrix = csr_matrix(
+                (self.weight[self.adjacency_edge_ids], self.indices, self.indptr),
+                shape=(node_count, node_count))
+        return self._matrix
+    
+    def shortest_paths(self, sources):
+        """Distancias y predecesores desde uno o varios nodos origen (índices)"""
+        instrumentation.count('dijkstra_runs', int(np.size(sources)))
+        return dijkstra(self.weight_matrix(), directed=True, indices=sources,
+                        return_predecessors=True)
+    
+    def path_from_predecessors(self, predecessors, source, destination):
+        """Reconstruye la ruta (índices de nodo) desde el árbol de predecesores"""
+        if source != destination and predecessors[destination] < 0:
+            return None
+        path = [destination]
+        while path[-1] != source:
+            path.append(int(predecessors[path[-1]]))
+        return path[::-1]
+    
+    def edge_ids_for_keys(self, sources, targets):
+        """Identificadores de las aristas (origen, destino) dadas como arreglos de índices"""
+        keys = (np.asarray(sources, dtype=np.int64) * len(self.node_names)
+                + np.asarray(targets, dtype=np.int64))
+        positions = np.searchsorted(self._adjacency_keys, keys)
+        # Una clave mayor que todas cae fuera del arreglo
+        found = positions < len(self._adjacency_keys)
+        found[found] = self._adjacency_keys[positions[found]] == keys[found]
+        if not found.all():
+            raise KeyError("la ruta usa aristas que no existen en el grafo")
+        return self.adjacency_edge_ids[positions]
+    
+    def edge_ids(self, path):
+        """Identificadores de arista de cada salto de la ruta"""
+        path = np.asarray(path, dtype=np.int64)
+        return self.edge_ids_for_keys(path[:-1], path[1:])
+    
+    def aggregate_path(self, path):
+        """Suma de latencia prevista, disponibilidad mínima y pérdida máxima de una ruta"""
+        edges = self.edge_ids(path)
+        if not len(edges):
+            return 0.0, 100.0, 0.0
+        # reduceat suma en el mismo orden que aggregate_paths, así coinciden bit a bit
+        return (float(np.add.reduceat(self.estimated_latency[edges], [0])[0]),
+                min(100.0, float(self.availability[edges].min())),
+                max(0.0, float(self.packet_loss[edges].max())))
+    
+    def aggregate_paths(self, paths, columns=None):
+        """Latencia prevista total, disponibilidad mínima y pérdida máxima de muchas rutas a la vez"""
+        # `columns` sustituye las columnas por arista, p. ej. por las de una franja
+        latency, availability, packet_loss = columns or (self.estimated_latency,
+                                                         self.availability, self.packet_loss)
+        path_count = len(paths)
+        total_latency = np.zeros(path_count)
+        min_availability = np.full(path_count, 100.0)
+        max_packet_loss = np.zeros(path_count)
+        if path_count == 0:
+            return total_latency, min_availability, max_packet_loss
+        
+        lengths = np.fromiter((len(path) for path in paths), dtype=np.int64, count=path_count)
+        nodes = np.concatenate([np.asarray(path, dtype=np.int64) for path in paths])
+        
+        # Saltos válidos: los que no cruzan de una ruta a la siguiente
+        hop_mask = np.ones(max(len(nodes) - 1, 0), dtype=bool)
+        hop_mask[np.cumsum(lengths)[:-1] - 1] = False
+        hop_starts = np.flatnonzero(hop_mask)
+        edges = self.edge_ids_for_keys(nodes[hop_starts], nodes[hop_starts + 1])
+        
+        hops = np.maximum(lengths - 1, 0)
+        with_hops = hops > 0
+        if not with_hops.any():
+            return total_latency, min_availability, max_packet_loss
+        offsets = np.concatenate(([0], np.cumsum(hops)[:-1]))[with_hops]
+        
+        total_latency[with_hops] = np.add.reduceat(latency[edges].astype(np.float64), offsets)
+        min_availability[with_hops] = np.minimum(
+            100.0, np.minimum.reduceat(availability[edges].astype(np.float64), offsets))
+        max_packet_loss[with_hops] = np.maximum(
+            0.0, np.maximum.reduceat(packet_loss[edges].astype(np.float64), offsets))
+        return total_latency, min_availability, max_packet_loss
+    
+    def set_estimated_latency(self, sources, targets, estimated_latency):
+        """Actualiza en sitio la latencia prevista de aristas existentes"""
+        self.estimated_latency[self.edge_ids_for_keys(sources, targets)] = estimated_latency
+    
+    def set_edge_metrics(self, sources, targets, weight, latency, availability, packet_loss):
+        """Actualiza en sitio las columnas de aristas ya existentes"""
+        edges = self.edge_ids_for_keys(sources, targets)
+        self.weight[edges] = weight
+        self.latency[edges] = latency
+        self.estimated_latency[edges] = latency  # Hasta que el modelo vuelva a predecir
+        self.availability[edges] = availability
+        self.packet_loss[edges] = packet_loss
+        self._matrix = None
+    
+    def find_route(self, source, destination):
+        """Ruta óptima con el mismo formato que NetworkGraphOptimizer.find_optimal_route"""
+        source_index = self.node_index[source]
+        destination_index = self.node_index[destination]
+        distances, predecessors = self.shortest_paths(source_index)
+        path = self.path_from_predecessors(predecessors, source_index, destination_index)
+        if path is None:
+            return None
+        
+        total_latency, min_availability, max_packet_loss = self.aggregate_path(path)
+        return {
+            'path': [self.node_names[node] for node in path],
+            'total_weight': float(distances[destination_index]),
+            'estimated_latency': total_latency,
+            'min_availability': min_availability,
+            'max_packet_loss': max_packet_loss
+        }
+
+def pareto_labels(adjacency, source, max_labels=None, availability_resolution=0.0,
+                  loss_resolution=0.0, max_latency_ratio=None):
+    """Frentes de Pareto desde source por etiquetas permanentes: {destino: [(lat, disp, pérdida, ruta)]}"""
+    indptr, indices, edge_ids, latency, availability, packet_loss = adjacency
+    node_count = len(indptr) - 1
+    
+    def level(value, resolution):
+        return value if resolution <= 0 else round(value / resolution)
+    
+    # Etiquetas: (latencia, disponibilidad, pérdida, nodo, etiqueta padre)
+    labels = [(0.0, 100.0, 0.0, source, -1)]
+    permanent = [[] for _ in range(node_count)]
+    # Escalones (disponibilidad, pérdida) de las etiquetas fijadas en cada nodo
+    levels = [[] for _ in range(node_count)]
+    latency_limit = [float('inf')] * node_count
+    heap = [(0.0, -100.0, 0.0, 0)]
+    
+    def dominated(node, avail_level, loss_level):
+        for other_avail, other_loss in levels[node]:
+            if other_avail >= avail_level and other_loss <= loss_level:
+                return True
+        return False
+    
+    while heap:
+        lat, neg_avail, loss, label_id = heapq.heappop(heap)
+        node = labels[label_id][3]
+        avail = -neg_avail
+        avail_level = level(avail, availability_resolution)
+        loss_level = level(loss, loss_resolution)
+        if lat > latency_limit[node] or dominated(node, avail_level, loss_level):
+            continue
+        if max_labels is not None and len(permanent[node]) >= max_labels:
+            continue
+        if not permanent[node] and max_latency_ratio is not None:
+            # Primera etiqueta del nodo: es la de menor latencia
+            latency_limit[node] = lat * max_latency_ratio
+        permanent[node].append(label_id)
+        levels[node].append((avail_level, loss_level))
+        
+        for position in range(indptr[node], indptr[node + 1]):
+            neighbor = indices[position]
+            edge = edge_ids[position]
+            new_lat = lat + latency[edge]
+            if new_lat > latency_limit[neighbor]:
+                continue
+            new_avail = min(avail, availability[edge])
+            new_loss = max(loss, packet_loss[edge])
+            if dominated(neighbor, level(new_avail, availability_resolution),
+                         level(new_loss, loss_resolution)):
+                continue
+            labels.append((new_lat, new_avail, new_loss, neighbor, label_id))
+            heapq.heappush(heap, (new_lat, -new_avail, new_loss, len(labels) - 1))
+    
+    fronts = {}
+    for node in range(node_count):
+        if node == source or not permanent[node]:
+            continue
+        front = []
+        for label_id in permanent[node]:
+            lat, avail, loss = labels[label_id][:3]
+            path = []
+            while label_id >= 0:
+                path.append(labels[label_id][3])
+                label_id = labels[label_id][4]
+            front.append((lat, avail, loss, path[::-1]))
+        fronts[node] = front
+    return fronts
+
+_pareto_adjacency = None  # Grafo de cada proceso trabajador
+
+def _init_pareto_worker(adjacency):
+    global _pareto_adjacency
+    _pareto_adjacency = adjacency
+
+def _worker_context():
+    """Contexto de multiprocessing para los trabajadores (sin fork: hay hilos vivos)"""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+def _pareto_worker(sources, options):
+    return _pareto_sources_inline(_pareto_adjacency, sources, options)
+
+def _pareto_sources_inline(adjacency, sources, options):
+    return [(source, pareto_labels(adjacency, source, **options)) for source in sources]
 
 class NetworkGraphOptimizer:
     """Módulo de optimización de grafos para encontrar rutas óptimas"""
     
     def __init__(self):
-        self.graph = nx.Graph()
+        self.graph = ObservedGraph()  # Inicializa también las cachés y la vista CSR
         self.fuzzy_evaluator = FuzzyNetworkEvaluator()
+        # Frente exacto; resoluciones > 0 o max_latency_ratio lo aproximan (ε-Pareto)
+        self.pareto_options = {'max_labels': None, 'availability_resolution': 0.0,
+                               'loss_resolution': 0.0, 'max_latency_ratio': None}
+    
+    @property
+    def graph(self):
+        return self._graph
+    
+    @graph.setter
+    def graph(self, graph):
+        """Adopta un grafo nuevo (copiado a un grafo observable si hace falta) y vacía las cachés"""
+        if not isinstance(graph, ObservedGraphMixin):
+            graph = (ObservedDiGraph if graph.is_directed() else ObservedGraph)(graph)
+        self._graph = graph
+        self.route_cache = RouteCache(directed=graph.is_directed())
+        self.distance_cache = {}
+        self.cumulative_decrease = 0.0  # Suma de reducciones de peso aplicadas
+        self._compact_graph = None
+        self._compact_version = None  # Versión del grafo que refleja la vista CSR
+        self.time_profiles = None  # Pesos y métricas por franja, alineados con la vista CSR
     
-    def build_network_graph(self, metrics_data):
+    def compact_graph(self):
+        """Vista CSR del grafo actual (se regenera tras cualquier modificación no sincronizada)"""
+        if self._compact_graph is None or self._compact_version != self.graph.version:
+            self._compact_graph = CompactGraph.from_networkx(self.graph)
+            self._compact_version = self.graph.version
+            # Los perfiles por franja estaban alineados con las aristas de la vista anterior
+            self.time_profiles = None
+        return self._compact_graph
+    
+    def collect_pair_metrics(self, metrics_data, servers=None, pairs=None):
+        """Empareja las métricas 'origen-destino' con los pares de servidores"""
+        if servers is None:
+            # Sin lista explícita, los nodos se deducen de las claves de métricas
+            servers = list(dict.fromkeys(name for pair_key in metrics_data
+                                         for name in pair_key.split('-', 1)))
+        if pairs is None:
+            # Sin enlaces permitidos explícitos se asume malla completa
+            pairs = [(server1, server2) for i, server1 in enumerate(servers)
+                     for server2 in servers[i+1:]]
+        
+        edges = []
+        for server1, server2 in pairs:
+            pair_key = f"{server1}-{server2}"
+            reverse_key = f"{server2}-{server1}"
+            
+            # Buscar métricas en ambas direcciones
+            metrics = None
+            if pair_key in metrics_data:
+                metrics = metrics_data[pair_key]
+            elif reverse_key in metrics_data:
+                metrics = metrics_data[reverse_key]
+            
+            if metrics:
+                edges.append((server1, server2, metrics))
+        
+        return servers, edges
+    
+    def score_edges(self, edges):
+        """Calcula los pesos difusos de una lista de aristas (u, v, métricas)"""
+        return self.fuzzy_evaluator.evaluate_link_quality_batch(
+            [metrics['latency'] for _, _, metrics in edges],
+            [metrics['availability'] for _, _, metrics in edges],
+            [metrics['packet_loss'] for _, _, metrics in edges]
+        )
+    
+    @instrumentation.timed()
+    def build_network_graph(self, metrics_data, servers=None, pairs=None):
         """Construye grafo ponderado con métricas difusas"""
+        servers, edges = self.collect_pair_metrics(metrics_data, servers, pairs)
+        
+        # Reconstrucción completa: se descartan aristas y rutas anteriores
+        self.graph.clear()
+        self.route_cache.clear()
+        self.distance_cache.clear()
+        self._compact_graph = None
+        self.time_profiles = None
+        
         # Agregar nodos
-        servers = ['Google_Cloud', 'AWS', 'Azure', 'Oracle_Cloud', 'Exadata_X11']
         self.graph.add_nodes_from(servers)
+        self.route_cache.resize_for_nodes(self.graph.number_of_nodes())
+        
+        if not edges:
+            return
+        
+        # Calcular todos los pesos difusos en una sola pasada
+        fuzzy_weights = self.score_edges(edges)
         
         # Agregar aristas con pesos difusos
-        for i, server1 in enumerate(servers):
-            for j, server2 in enumerate(servers[i+1:], i+1):
-                pair_key = f"{server1}-{server2}"
-                reverse_key = f"{server2}-{server1}"
-                
-                # Buscar métricas en ambas direcciones
-                metrics = None
-                if pair_key in metrics_data:
-                    metrics = metrics_data[pair_key]
-                elif reverse_key in metrics_data:
-                    metrics = metrics_data[reverse_key]
-                
-                if metrics:
-                    # Calcular peso usando lógica difusa
-                    fuzzy_weight = self.fuzzy_evaluator.evaluate_link_quality(
-                        metrics['latency'],
-                        metrics['availability'],
-                        metrics['packet_loss']
-                    )
-                    
-                    self.graph.add_edge(server1, server2, weight=fuzzy_weight,
-                                      latency=metrics['latency'],
-                                      availability=metrics['availability'],
-                                      packet_loss=metrics['packet_loss'])
+        for (server1, server2, metrics), fuzzy_weight in zip(edges, fuzzy_weights):
+            self.graph.add_edge(server1, server2, weight=float(fuzzy_weight),
+                              latency=metrics['latency'],
+                              availability=metrics['availability'],
+                              packet_loss=metrics['packet_loss'])
     
+    @instrumentation.timed()
+    def update_edge_metrics(self, edge_updates, tolerance=1e-6):
+        """Aplica cambios de métricas por arista y recalcula solo las aristas modificadas"""
+        metric_names = ('latency', 'availability', 'packet_loss')
+        changed_edges = []
+        removed_edges = []
+        self.discard_stale_compact_graph()
+        
+        for (source, destination), metrics in edge_updates.items():
+            if metrics is None:
+                # Enlace caído: se elimina la arista
+                if self.graph.has_edge(source, destination):
+                    removed_edges.append((source, destination))
+                continue
+            
+            current = self.graph.get_edge_data(source, destination, default={})
+            merged = {name: metrics.get(name, current.get(name)) for name in metric_names}
+            if any(value is None for value in merged.values()):
+                logging.warning(f"Métricas incompletas para {source}-{destination}, se omite")
+                continue
+            
+            if current and all(abs(merged[name] - current[name]) <= tolerance
+                               for name in metric_names):
+                continue
+            changed_edges.append((source, destination, merged))
+        
+        # Pesos anteriores y nuevos de cada arista modificada (inf = no existía)
+        weight_changes = {}
+        for source, destination in removed_edges:
+            weight_changes[(source, destination)] = (
+                self.graph[source][destination]['weight'], float('inf'))
+            self.graph.remove_edge(source, destination)
+        
+        if changed_edges:
+            new_weights = self.score_edges(changed_edges)
+            for (source, destination, metrics), new_weight in zip(changed_edges, new_weights):
+                old_weight = self.graph.get_edge_data(source, destination,
+                                                      default={}).get('weight', float('inf'))
+                # La predicción anterior deja de valer hasta que el modelo se reaplique
+                self.graph.add_edge(source, destination, weight=float(new_weight),
+                                    estimated_latency=metrics['latency'], **metrics)
+                weight_changes[(source, destination)] = (old_weight, float(new_weight))
+        
+        if weight_changes:
+            self.update_compact_graph(removed_edges, changed_edges, weight_changes)
+            self.invalidate_routes(weight_changes)
+            self.invalidate_time_dependent_routes()
+            logging.info(f"Grafo actualizado: {len(weight_changes)} aristas modificadas, "
+                         f"{len(self.route_cache)} rutas en caché vigentes")
+        
+        return list(weight_changes)
+    
+    def discard_stale_compact_graph(self):
+        """Descarta la vista CSR si el grafo cambió sin sincronizarla (antes de editarla en sitio)"""
+        if self._compact_version != self.graph.version:
+            self._compact_graph = None
+            self.time_profiles = None
+    
+    def update_compact_graph(self, removed_edges, changed_edges, weight_changes):
+        """Mantiene la vista CSR al día: en sitio si la topología no cambió, si no se descarta"""
+        compact = self._compact_graph
+        if compact is None:
+            return
+        topology_changed = removed_edges or any(
+            weight_changes[(source, destination)][0] == float('inf')
+            for source, destination, _ in changed_edges)
+        if topology_changed:
+            # Los perfiles por franja están alineados con las aristas de la vista anterior
+            self._compact_graph = None
+            self.time_profiles = None
+            return
+        
+        index = compact.node_index
+        compact.set_edge_metrics(
+            [index[source] for source, _, _ in changed_edges],
+            [index[destination] for _, destination, _ in changed_edges],
+            [weight_changes[(source, destination)][1] for source, destination, _ in changed_edges],
+            [metrics['latency'] for _, _, metrics in changed_edges],
+            [metrics['availability'] for _, _, metrics in changed_edges],
+            [metrics['packet_loss'] for _, _, metrics in changed_edges])
+        self._compact_version = self.graph.version
+    
+    def apply_latency_estimates(self, estimates, tolerance=1e-3):
+        """Fija la latencia prevista de cada arista {(u, v): ms}"""
+        changed = []
+        self.discard_stale_compact_graph()
+        for (source, destination), estimate in estimates.items():
+            if not self.graph.has_edge(source, destination) or np.isnan(estimate):
+                continue
+            edge_data = self.graph[source][destination]
+            current = edge_data.get('estimated_latency', edge_data['latency'])
+            if abs(estimate - current) <= tolerance:
+                continue
+            edge_data['estimated_latency'] = float(estimate)
+            changed.append((source, destination))
+        
+        if not changed:
+            return []
+        compact = self._compact_graph
+        if compact is not None:
+            index = compact.node_index
+            compact.set_estimated_latency(
+                [index[source] for source, _ in changed],
+                [index[destination] for _, destination in changed],
+                [self.graph[source][destination]['estimated_latency']
+                 for source, destination in changed])
+            self._compact_version = self.graph.version
+        # Los pesos no cambian: basta con invalidar las rutas que usan esas aristas
+        self.route_cache.invalidate_edges(changed)
+        return changed
+    
+    def aggregate_path(self, path):
+        """Métricas agregadas (latencia, disponibilidad, pérdida) de una ruta dada por nombre"""
+        compact = self.compact_graph()
+        return compact.aggregate_path([compact.node_index[node] for node in path])
+    
+    def aggregate_paths(self, paths):
+        """Métricas agregadas (latencia, disponibilidad, pérdida) de rutas dadas por nombre"""
+        compact = self.compact_graph()
+        index = compact.node_index
+        return compact.aggregate_paths([[index[node] for node in path] for path in paths])
+    
+    def cached_distance(self, source, target):
+        """Cota inferior de la distancia actual entre dos nodos según la caché, o None"""
+        for origin, node in ((source, target), (target, source)):
+            entry = self.distance_cache.get(origin)
+            if entry and node in entry[0]:
+                distances, recorded_decrease = entry
+                # Las reducciones posteriores solo pueden acortar la distancia
+                return distances[node] - (self.cumulative_decrease - recorded_decrease)
+            if self.graph.is_directed():
+                break
+        return None
+    
+    def invalidate_routes(self, weight_changes):
+        """Invalida solo las rutas en caché afectadas por las aristas modificadas"""
+        decreased = []
+        for (source, destination), (old_weight, new_weight) in weight_changes.items():
+            if new_weight < old_weight:
+                decreased.append((source, destination, new_weight))
+                if old_weight == float('inf'):
+                    # Una arista nueva no tiene cota: las distancias en caché dejan de servir
+                    self.distance_cache.clear()
+                else:
+                    self.cumulative_decrease += old_weight - new_weight
+        
+        # Entradas cuyas rutas usan una arista modificada: sus métricas ya no son válidas
+        self.route_cache.invalidate_edges(weight_changes)
+        
+        # Una arista más barata podría abrir un camino más corto que los guardados
+        if not decreased:
+            return
+        for cache_key, _, weight_bound in self.route_cache.entries():
+            _, source, destination, _, _ = cache_key
+            for u, v, new_weight in decreased:
+                orientations = [(u, v), (v, u)] if not self.graph.is_directed() else [(u, v)]
+                if any(self.could_improve(source, destination, a, b, new_weight, weight_bound)
+                       for a, b in orientations):
+                    self.route_cache.invalidate(cache_key)
+                    break
+    
+    def could_improve(self, source, destination, u, v, weight, current_length):
+        """Indica si pasar por la arista (u, v) podría mejorar la distancia actual"""
+        to_u = 0 if source == u else self.cached_distance(source, u)
+        from_v = 0 if v == destination else self.cached_distance(v, destination)
+        if to_u is None or from_v is None:
+            return True  # Sin cota conocida se invalida por seguridad
+        return to_u + weight + from_v < current_length
+    
+    def route_key(self, kind, source, destination, k=1, weight='weight'):
+        """Clave de caché: (tipo, origen, destino, k, atributo de peso)"""
+        return (kind, source, destination, k, weight)
+    
+    @instrumentation.timed()
     def find_optimal_route(self, source, destination):
         """Encuentra ruta óptima usando algoritmo de Dijkstra"""
+        cache_key = self.route_key('optimal', source, destination)
+        cached = self.route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            path = nx.shortest_path(self.graph, source, destination, weight='weight')
-            path_length = nx.shortest_path_length(self.graph, source, destination, weight='weight')
+            # Una sola búsqueda devuelve la distancia y la ruta
+            instrumentation.count('dijkstra_runs')
+            path_length, path = nx.single_source_dijkstra(self.graph, source, destination,
+                                                          weight='weight')
             
             # Calcular métricas agregadas de la ruta
-            total_latency = 0
-            min_availability = 100
-            max_packet_loss = 0
+            total_latency, min_availability, max_packet_loss = self.aggregate_path(path)
+            
+            route = {
+                'path': path,
+                'total_weight': path_length,
+                'estimated_latency': total_latency,
+                'min_availability': min_availability,
+                'max_packet_loss': max_packet_loss
+            }
+            self.route_cache.put(cache_key, route, [path], path_length)
+            return route
+        except nx.NetworkXNoPath:
+            return None
+    
+    def set_time_profiles(self, profiles, bucket_seconds=3600, period_seconds=86400):
+        """Precalcula pesos difusos y métricas de cada arista para cada franja del periodo"""
+        compact = self.compact_graph()
+        bucket_count = int(np.ceil(period_seconds / bucket_seconds))
+        edge_count = compact.number_of_edges()
+        names = compact.node_names
+        
+        columns = {name: np.repeat(getattr(compact, name)[np.newaxis, :].astype(np.float64),
+                                   bucket_count, axis=0)
+                   for name in ('latency', 'availability', 'packet_loss')}
+        for edge, (u, v) in enumerate(zip(compact.edge_sources, compact.edge_targets)):
+            profile = (profiles.get(f"{names[u]}-{names[v]}")
+                       or profiles.get(f"{names[v]}-{names[u]}"))
+            if profile is not None:
+                for name, column in columns.items():
+                    column[:, edge] = profile[name]
+        
+        # Todos los pesos (franjas × aristas) en una sola evaluación vectorizada
+        weights = self.fuzzy_evaluator.evaluate_link_quality_batch(
+            columns['latency'].ravel(), columns['availability'].ravel(),
+            columns['packet_loss'].ravel()).reshape(bucket_count, edge_count)
+        
+        node_count = compact.number_of_nodes()
+        matrices = [csr_matrix((weights[bucket][compact.adjacency_edge_ids], compact.indices,
+                                compact.indptr), shape=(node_count, node_count))
+                    for bucket in range(bucket_count)]
+        
+        self.time_profiles = {
+            'bucket_seconds': bucket_seconds,
+            'period_seconds': period_seconds,
+            'weight': weights,
+            'matrices': matrices,
+            **columns
+        }
+        self.invalidate_time_dependent_routes()
+        logging.info(f"Perfiles por franja: {bucket_count} franjas de {bucket_seconds}s "
+                     f"para {edge_count} aristas")
+    
+    def invalidate_time_dependent_routes(self):
+        """Descarta las rutas por franja guardadas en caché"""
+        for cache_key, _, _ in self.route_cache.entries():
+            if cache_key[0] == 'timed':
+                self.route_cache.invalidate(cache_key)
+    
+    def time_bucket(self, when):
+        """Franja del periodo que corresponde a un instante (datetime, ISO 8601 o epoch)"""
+        profiles = self.time_profiles
+        if isinstance(when, str):
+            when = datetime.fromisoformat(when)
+        elif isinstance(when, (int, float, np.number)):
+            when = datetime.fromtimestamp(float(when))
+        if when.tzinfo is not None:
+            when = when.astimezone().replace(tzinfo=None)
+        # Las mediciones guardan la hora local sin zona: se compara en la misma escala
+        epoch = float(MetricsTimeSeriesStore.to_epoch_seconds([when])[0])
+        return int((epoch % profiles['period_seconds']) // profiles['bucket_seconds'])
+    
+    def find_route_at(self, source, destination, when=None):
+        """Ruta óptima usando el perfil de la franja de `when` (o la estática si no hay perfiles)"""
+        compact = self.compact_graph()  # Si el grafo cambió, descarta también los perfiles
+        if self.time_profiles is None:
+            return self.find_optimal_route(source, destination)
+        
+        bucket = self.time_bucket(datetime.now() if when is None else when)
+        cache_key = self.route_key('timed', source, destination, weight=f'bucket_{bucket}')
+        cached = self.route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        source_index = compact.node_index[source]
+        destination_index = compact.node_index[destination]
+        instrumentation.count('dijkstra_runs')
+        distances, predecessors = dijkstra(self.time_profiles['matrices'][bucket], directed=True,
+                                           indices=source_index, return_predecessors=True)
+        path = compact.path_from_predecessors(predecessors, source_index, destination_index)
+        if path is None:
+            return None
+        
+        profiles = self.time_profiles
+        total_latency, min_availability, max_packet_loss = compact.aggregate_paths(
+            [path], (profiles['latency'][bucket], profiles['availability'][bucket],
+                     profiles['packet_loss'][bucket]))
+        path = [compact.node_names[node] for node in path]
+        route = {
+            'path': path,
+            'total_weight': float(distances[destination_index]),
+            'estimated_latency': float(total_latency[0]),
+            'min_availability': float(min_availability[0]),
+            'max_packet_loss': float(max_packet_loss[0]),
+            'time_bucket': bucket
+        }
+        self.route_cache.put(cache_key, route, [path], route['total_weight'])
+        return route
+    
+    @instrumentation.timed()
+    def find_all_optimal_routes(self, nodes=None):
+        """Calcula las rutas óptimas de todos los pares con una búsqueda por nodo origen"""
+        if nodes is None:
+            nodes = list(self.graph.nodes)
+        nodes = [node for node in nodes if node in self.graph]
+        symmetric = not self.graph.is_directed()
+        routes = {}
+        
+        for index, source in enumerate(nodes):
+            # En un grafo no dirigido basta con los destinos posteriores
+            destinations = nodes[index + 1:] if symmetric else nodes
+            
+            # Las rutas aún vigentes en caché no se recalculan
+            pending = []
+            for destination in destinations:
+                if destination == source:
+                    continue
+                cached = self.route_cache.get(self.route_key('optimal', source, destination))
+                reverse = (self.route_cache.get(self.route_key('optimal', destination, source))
+                           if symmetric else None)
+                if cached is None or (symmetric and reverse is None):
+                    pending.append(destination)
+                    continue
+                routes[(source, destination)] = cached
+                if symmetric:
+                    routes[(destination, source)] = reverse
+            if not pending:
+                continue
+            destinations = pending
+            
+            instrumentation.count('dijkstra_runs')
+            distances, paths = nx.single_source_dijkstra(self.graph, source, weight='weight')
+            self.distance_cache[source] = (distances, self.cumulative_decrease)
+            
+            destinations = [destination for destination in destinations
+                            if destination != source and destination in paths]
+            route_paths = [paths[destination] for destination in destinations]
+            if symmetric:
+                # El sentido inverso se suma aparte, igual que en find_optimal_route,
+                # para que ambas coincidan bit a bit
+                route_paths += [path[::-1] for path in route_paths]
+            # Métricas de todas las rutas del origen en una sola pasada vectorizada
+            total_latency, min_availability, max_packet_loss = self.aggregate_paths(route_paths)
+            
+            for position, destination in enumerate(destinations):
+                routes[(source, destination)] = {
+                    'path': paths[destination],
+                    'total_weight': distances[destination],
+                    'estimated_latency': float(total_latency[position]),
+                    'min_availability': float(min_availability[position]),
+                    'max_packet_loss': float(max_packet_loss[position])
+                }
+                if symmetric:
+                    reverse_position = position + len(destinations)
+                    routes[(destination, source)] = {
+                        **routes[(source, destination)],
+                        'path': route_paths[reverse_position],
+                        'estimated_latency': float(total_latency[reverse_position])
+                    }
+                    self.route_cache.put(self.route_key('optimal', destination, source),
+                                         routes[(destination, source)], [paths[destination]],
+                                         distances[destination])
+                self.route_cache.put(self.route_key('optimal', source, destination),
+                                     routes[(source, destination)], [paths[destination]],
+                                     distances[destination])
+        
+        return routes
+    
+    def k_shortest_paths(self, source, destination, k=3, max_hops=None, max_weight=None):
+        """Genera perezosamente hasta k rutas simples en orden de peso (algoritmo de Yen)"""
+        if k <= 0:
+            return
+        
+        instrumentation.count('k_shortest_searches')
+        if max_hops is None:
+            paths = nx.shortest_simple_paths(self.graph, source, destination, weight='weight')
+        else:
+            paths = self.hop_limited_simple_paths(source, destination, max_hops)
+        
+        found = 0
+        for path in paths:
+            path_length = nx.path_weight(self.graph, path, weight='weight')
             
-            for i in range(len(path) - 1):
-                edge_data = self.graph[path[i]][path[i+1]]
-                total_latency += edge_data['latency']
-                min_availability = min(min_availability, edge_data['availability'])
-                max_packet_loss = max(max_packet_loss, edge_data['packet_loss'])
+            # Las rutas llegan en orden creciente de peso: se puede cortar la búsqueda
+            if max_weight is not None and path_length > max_weight:
+                break
             
-            return {
-                'path': path,
-                'total_weight': path_length,
-                'estimated_latency': total_latency,
-                'min_availability': min_availability,
-                'max_packet_loss': max_packet_loss
-            }
-        except nx.NetworkXNoPath:
+            yield path, path_length
+            found += 1
+            if found >= k:
+                break
+    
+    def hop_limited_shortest_path(self, source, destination, max_hops, excluded_nodes=(),
+                                  excluded_edges=()):
+        """Camino de menor peso con a lo sumo max_hops saltos (Bellman-Ford por capas), o None"""
+        if source in excluded_nodes:
             return None
+        # Con pesos positivos el mejor recorrido acotado en saltos es siempre simple
+        best = {source: 0.0}
+        parents = []  # parents[i][v]: predecesor de v en el mejor camino de i+1 saltos
+        frontier = {source: 0.0}
+        for _ in range(max_hops):
+            layer_parents = {}
+            next_frontier = {}
+            for u, distance in frontier.items():
+                for v, data in self.graph.adj[u].items():
+                    if v in excluded_nodes or (u, v) in excluded_edges:
+                        continue
+                    candidate = distance + data.get('weight', 1)
+                    if candidate < best.get(v, float('inf')):
+                        best[v] = candidate
+                        next_frontier[v] = candidate
+                        layer_parents[v] = u
+            parents.append(layer_parents)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        
+        if destination not in best or destination == source:
+            return [source] if destination == source else None
+        
+        # La última capa que mejoró el destino da su camino óptimo
+        layer = max(i for i, layer_parents in enumerate(parents) if destination in layer_parents)
+        path = [destination]
+        for i in range(layer, -1, -1):
+            path.append(parents[i][path[-1]])
+        return path[::-1]
     
-    def compare_routes(self, source, destination, k=3):
+    def hop_limited_simple_paths(self, source, destination, max_hops):
+        """Yen con el límite de saltos aplicado al generar cada ruta de desvío"""
+        directed = self.graph.is_directed()
+        first = self.hop_limited_shortest_path(source, destination, max_hops)
+        if first is None:
+            return
+        accepted = [first]
+        candidates = []
+        seen = {tuple(first)}
+        yield first
+        
+        while True:
+            previous = accepted[-1]
+            for i in range(len(previous) - 1):
+                root = previous[:i + 1]
+                excluded_edges = set()
+                for path in accepted:
+                    if path[:i + 1] == root and len(path) > i + 1:
+                        excluded_edges.add((path[i], path[i + 1]))
+                        if not directed:
+                            excluded_edges.add((path[i + 1], path[i]))
+                
+                # El desvío solo dispone de los saltos que no consumió la raíz
+                spur = self.hop_limited_shortest_path(root[-1], destination, max_hops - i,
+                                                      set(root[:-1]), excluded_edges)
+                if spur is None:
+                    continue
+                candidate = root[:-1] + spur
+                if tuple(candidate) not in seen:
+                    seen.add(tuple(candidate))
+                    heapq.heappush(candidates, (nx.path_weight(self.graph, candidate, 'weight'),
+                                                len(candidate), candidate))
+            
+            if not candidates:
+                return
+            _, _, path = heapq.heappop(candidates)
+            accepted.append(path)
+            yield path
+    
+    @instrumentation.timed()
+    def compare_routes(self, source, destination, k=3, max_hops=None, max_weight=None):
         """Compara múltiples rutas alternativas"""
+        # Solo se guardan en caché las consultas sin límites adicionales
+        cacheable = max_hops is None and max_weight is None
+        cache_key = self.route_key('alternatives', source, destination, k)
+        if cacheable:
+            cached = self.route_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            if not self.graph.is_directed():
+                # En un grafo no dirigido las alternativas de B→A son las de A→B invertidas
+                reverse = self.route_cache.get(self.route_key('alternatives', destination,
+                                                              source, k))
+                if reverse is not None:
+                    return self.reverse_alternatives(cache_key, reverse)
+        
         try:
-            # Obtener k rutas más cortas
-            paths = list(nx.shortest_simple_paths(self.graph, source, destination, weight='weight'))
+            # Obtener k rutas más cortas sin enumerar todas las rutas simples
+            paths = list(self.k_shortest_paths(source, destination, k, max_hops, max_weight))
+            
+            # Métricas de todas las rutas en una sola pasada vectorizada
+            total_latency, min_availability, max_packet_loss = self.aggregate_paths(
+                [path for path, _ in paths])
             
             route_comparison = []
-            for i, path in enumerate(paths[:k]):
-                path_length = nx.path_weight(self.graph, path, weight='weight')
-                
-                # Calcular métricas de la ruta
-                total_latency = sum(self.graph[path[j]][path[j+1]]['latency'] 
-                                  for j in range(len(path)-1))
-                min_availability = min(self.graph[path[j]][path[j+1]]['availability'] 
-                                     for j in range(len(path)-1))
-                max_packet_loss = max(self.graph[path[j]][path[j+1]]['packet_loss'] 
-                                    for j in range(len(path)-1))
-                
+            for i, (path, path_length) in enumerate(paths):
                 route_comparison.append({
                     'rank': i + 1,
                     'path': ' → '.join(path),
                     'total_weight': round(path_length, 2),
-                    'estimated_latency': round(total_latency, 2),
-                    'min_availability': round(min_availability, 2),
-                    'max_packet_loss': round(max_packet_loss, 2)
+                    'estimated_latency': round(float(total_latency[i]), 2),
+                    'min_availability': round(float(min_availability[i]), 2),
+                    'max_packet_loss': round(float(max_packet_loss[i]), 2)
                 })
             
+            if cacheable and paths:
+                self.route_cache.put(cache_key, route_comparison,
+                                     [path for path, _ in paths], paths[-1][1])
             return route_comparison
         except nx.NetworkXNoPath:
             return []
+    
+    def reverse_alternatives(self, cache_key, route_comparison):
+        """Guarda y devuelve una comparación de rutas recorrida en sentido contrario"""
+        paths = [route['path'].split(' → ')[::-1] for route in route_comparison]
+        reversed_comparison = [dict(route, path=' → '.join(path))
+                               for route, path in zip(route_comparison, paths)]
+        self.route_cache.put(cache_key, reversed_comparison, paths,
+                             nx.path_weight(self.graph, paths[-1], weight='weight'))
+        return reversed_comparison
+    
+    def pareto_adjacency(self):
+        """Listas de adyacencia y métricas por arista para la búsqueda multiobjetivo"""
+        compact = self.compact_graph()
+        return (compact.indptr.tolist(), compact.indices.tolist(),
+                compact.adjacency_edge_ids.tolist(), compact.estimated_latency.tolist(),
+                compact.availability.tolist(), compact.packet_loss.tolist())
+    
+    def pareto_front_routes(self, front):
+        """Convierte las etiquetas de un destino en rutas ordenadas por latencia"""
+        names = self.compact_graph().node_names
+        return [{
+            'path': [names[node] for node in path],
+            'estimated_latency': lat,
+            'min_availability': avail,
+            'max_packet_loss': loss
+        } for lat, avail, loss, path in sorted(front, key=lambda label: (label[0], -label[1], label[2]))]
+    
+    def pareto_routes(self, source, destination, **options):
+        """Rutas Pareto-óptimas entre dos nodos (latencia, disponibilidad, pérdida)"""
+        compact = self.compact_graph()
+        if source not in compact.node_index or destination not in compact.node_index:
+            return []
+        instrumentation.count('pareto_searches')
+        fronts = pareto_labels(self.pareto_adjacency(), compact.node_index[source],
+                               **dict(self.pareto_options, **options))
+        return self.pareto_front_routes(fronts.get(compact.node_index[destination], []))
+    
+    @instrumentation.timed()
+    def find_all_pareto_routes(self, nodes=None, max_workers=None, chunk_size=None, **options):
+        """Frentes de Pareto de todos los pares, con un proceso por bloque de nodos origen"""
+        options = dict(self.pareto_options, **options)
+        compact = self.compact_graph()
+        if nodes is None:
+            nodes = compact.node_names
+        node_indices = [compact.node_index[node] for node in nodes if node in compact.node_index]
+        wanted = set(node_indices)
+        adjacency = self.pareto_adjacency()
+        instrumentation.count('pareto_searches', len(node_indices))
+        
+        workers = max_workers or os.cpu_count() or 1
+        if workers == 1 or len(node_indices) < 2 * workers:
+            results = _pareto_sources_inline(adjacency, node_indices, options)
+        else:
+            chunk_size = chunk_size or max(1, len(node_indices) // (workers * 4))
+            chunks = [node_indices[i:i + chunk_size]
+                      for i in range(0, len(node_indices), chunk_size)]
+            results = []
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_pareto_worker,
+                                     initargs=(adjacency,),
+                                     mp_context=_worker_context()) as executor:
+                futures = [executor.submit(_pareto_worker, chunk, options) for chunk in chunks]
+                for future in futures:
+                    results.extend(future.result())
+        
+        names = compact.node_names
+        routes = {}
+        for source, fronts in results:
+            for destination, front in fronts.items():
+                if destination in wanted:
+                    routes[(names[source], names[destination])] = self.pareto_front_routes(front)
+        return routes
+    
+    @staticmethod
+    def choose_pareto_route(front, max_latency=None, min_availability=None, max_packet_loss=None):
+        """Elige del frente la ruta de menor latencia que cumple los límites indicados"""
+        for route in front:  # El frente ya está ordenado por latencia
+            if max_latency is not None and route['estimated_latency'] > max_latency:
+                continue
+            if min_availability is not None and route['min_availability'] < min_availability:
+                continue
+            if max_packet_loss is not None and route['max_packet_loss'] > max_packet_loss:
+                continue
+            return route
+        return None
+
+class OnlineErrorStats:
+    """Acumulador en línea (Welford) de errores entre predicción y medición real"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.count = 0
+        self.mean_predicted = 0.0
+        self.mean_actual = 0.0
+        self.m2_predicted = 0.0   # Suma de cuadrados centrada de las predicciones
+        self.m2_actual = 0.0      # Suma de cuadrados centrada de las mediciones
+        self.comoment = 0.0       # Co-momento predicción-medición
+        self.sum_abs_error = 0.0
+        self.sum_squared_error = 0.0
+        self.sum_abs_percentage_error = 0.0
+    
+    def add(self, predicted, actual):
+        """Incorpora una pareja (predicción, medición) en O(1)"""
+        self.count += 1
+        delta_predicted = predicted - self.mean_predicted
+        delta_actual = actual - self.mean_actual
+        self.mean_predicted += delta_predicted / self.count
+        self.mean_actual += delta_actual / self.count
+        self.m2_predicted += delta_predicted * (predicted - self.mean_predicted)
+        self.m2_actual += delta_actual * (actual - self.mean_actual)
+        self.comoment += delta_predicted * (actual - self.mean_actual)
+        self._accumulate_errors(predicted, actual, 1)
+    
+    def remove(self, predicted, actual):
+        """Retira una pareja previamente agregada (para ventanas deslizantes)"""
+        if self.count <= 1:
+            self.reset()
+            return
+        # Inversa de add(): se usan las medias con y sin la pareja retirada
+        mean_predicted_with = self.mean_predicted
+        mean_actual_with = self.mean_actual
+        self.count -= 1
+        self.mean_predicted -= (predicted - self.mean_predicted) / self.count
+        self.mean_actual -= (actual - self.mean_actual) / self.count
+        self.m2_predicted -= (predicted - self.mean_predicted) * (predicted - mean_predicted_with)
+        self.m2_actual -= (actual - self.mean_actual) * (actual - mean_actual_with)
+        self.comoment -= (predicted - self.mean_predicted) * (actual - mean_actual_with)
+        self._accumulate_errors(predicted, actual, -1)
+    
+    def _accumulate_errors(self, predicted, actual, sign):
+        error = actual - predicted
+        self.sum_abs_error += sign * abs(error)
+        self.sum_squared_error += sign * error ** 2
+        if actual:
+            self.sum_abs_percentage_error += sign * abs(error / actual)
+    
+    def metrics(self):
+        """Métricas agregadas con el mismo formato que calculate_aggregate_metrics"""
+        if self.count == 0:
+            return None
+        
+        mae = self.sum_abs_error / self.count  # Mean Absolute Error
+        rmse = np.sqrt(max(self.sum_squared_error, 0.0) / self.count)  # Root Mean Square Error
+        mape = self.sum_abs_percentage_error / self.count * 100  # Mean Absolute Percentage Error
+        
+        # Coeficiente de correlación
+        variance_product = self.m2_predicted * self.m2_actual
+        correlation = (self.comoment / np.sqrt(variance_product)
+                       if variance_product > 0 else float('nan'))
+        
+        # R-squared
+        r_squared = 1 - (self.sum_squared_error / self.m2_actual) if self.m2_actual > 0 else 0
+        
+        return {
+            'mae': round(float(mae), 3),
+            'rmse': round(float(rmse), 3),
+            'mape': round(float(mape), 2),
+            'correlation': round(float(correlation), 3),
+            'r_squared': round(float(r_squared), 3),
+            'sample_size': self.count
+        }
 
 class ResultValidator:
     """Módulo de validación de resultados y cálculo de errores"""
     
-    def __init__(self):
-        self.predictions = []
-        self.actual_measurements = []
+    def __init__(self, window_size=100):
+        self.stats = OnlineErrorStats()
+        self.window_stats = OnlineErrorStats()
+        self.window = deque(maxlen=window_size)
+        self.route_stats = {}
     
-    def validate_prediction(self, predicted_latency, actual_latency):
+    def validate_prediction(self, predicted_latency, actual_latency, route=None):
         """Valida predicción individual y calcula errores"""
         absolute_error = abs(actual_latency - predicted_latency)
         relative_error = absolute_error / actual_latency if actual_latency > 0 else 0
@@ -250,173 +2185,965 @@ class ResultValidator:
             'absolute_error': absolute_error,
             'relative_error': relative_error,
             'percentage_error': percentage_error,
-            'within_threshold': percentage_error <= 10  # Umbral del 10%
+            'within_threshold': bool(percentage_error <= 10)  # Umbral del 10%
         }
         
-        self.predictions.append(predicted_latency)
-        self.actual_measurements.append(actual_latency)
+        # Acumuladores globales, de ventana deslizante y por ruta
+        self.stats.add(predicted_latency, actual_latency)
+        
+        if len(self.window) == self.window.maxlen:
+            self.window_stats.remove(*self.window[0])
+        self.window.append((predicted_latency, actual_latency))
+        self.window_stats.add(predicted_latency, actual_latency)
+        
+        if route is not None:
+            self.route_stats.setdefault(route, OnlineErrorStats()).add(predicted_latency,
+                                                                       actual_latency)
         
         return validation_result
     
     def calculate_aggregate_metrics(self):
         """Calcula métricas agregadas de validación"""
-        if not self.predictions or not self.actual_measurements:
-            return None
+        return self.stats.metrics()
+    
+    def calculate_window_metrics(self):
+        """Métricas de las últimas window_size validaciones"""
+        return self.window_stats.metrics()
+    
+    def calculate_route_metrics(self, route=None):
+        """Métricas por ruta (o de una ruta concreta)"""
+        if route is not None:
+            stats = self.route_stats.get(route)
+            return stats.metrics() if stats else None
+        return {route_key: stats.metrics() for route_key, stats in self.route_stats.items()}
+
+class LatencyPredictor:
+    """Predicción de latencia por enlace: EWMA de las mediciones más un sesgo aprendido"""
+    
+    def __init__(self, learning_rate=0.3, max_bias_fraction=0.5, initial_capacity=256,
+                 directed=False):
+        self.learning_rate = learning_rate
+        self.max_bias_fraction = max_bias_fraction  # Límite del sesgo respecto del EWMA
+        self.directed = directed
+        self.link_keys = []
+        self.link_index = {}
+        self.baseline = np.full(initial_capacity, np.nan)
+        self.bias = np.zeros(initial_capacity)
+        self.residual_count = np.zeros(initial_capacity, dtype=np.int64)
+    
+    def __len__(self):
+        return len(self.link_keys)
+    
+    def link_key(self, source, destination):
+        """En un grafo no dirigido A-B y B-A comparten modelo; en uno dirigido, no"""
+        if self.directed or source <= destination:
+            return (source, destination)
+        return (destination, source)
+    
+    def _indices(self, links):
+        indices = np.empty(len(links), dtype=np.int64)
+        for position, (source, destination) in enumerate(links):
+            key = self.link_key(source, destination)
+            index = self.link_index.get(key)
+            if index is None:
+                index = len(self.link_keys)
+                self.link_index[key] = index
+                self.link_keys.append(key)
+            indices[position] = index
         
-        predictions = np.array(self.predictions)
-        actuals = np.array(self.actual_measurements)
+        capacity = len(self.baseline)
+        if len(self.link_keys) > capacity:
+            while capacity < len(self.link_keys):
+                capacity *= 2
+            extra = capacity - len(self.baseline)
+            self.baseline = np.concatenate([self.baseline, np.full(extra, np.nan)])
+            self.bias = np.concatenate([self.bias, np.zeros(extra)])
+            self.residual_count = np.concatenate([self.residual_count,
+                                                  np.zeros(extra, dtype=np.int64)])
+        return indices
+    
+    def update_baseline(self, links, latencies):
+        """Fija el EWMA actual de cada enlace (p. ej. latency_ewma del almacén)"""
+        indices = self._indices(links)
+        latencies = np.asarray(latencies, dtype=float)
+        valid = ~np.isnan(latencies)
+        self.baseline[indices[valid]] = latencies[valid]
+    
+    def learn(self, links, measured_latencies):
+        """Actualiza el sesgo de cada enlace con los residuos de una validación"""
+        indices = self._indices(links)
+        measured = np.asarray(measured_latencies, dtype=float)
+        valid = ~np.isnan(measured) & ~np.isnan(self.baseline[indices])
+        indices, measured = indices[valid], measured[valid]
+        if not len(indices):
+            return 0
         
-        # Métricas de error
-        mae = np.mean(np.abs(actuals - predictions))  # Mean Absolute Error
-        rmse = np.sqrt(np.mean((actuals - predictions) ** 2))  # Root Mean Square Error
-        mape = np.mean(np.abs((actuals - predictions) / actuals)) * 100  # Mean Absolute Percentage Error
+        # Residuo medio por enlace (un enlace puede aparecer varias veces en el lote)
+        unique, inverse = np.unique(indices, return_inverse=True)
+        residuals = np.bincount(inverse, weights=measured - self.baseline[indices])
+        residuals /= np.bincount(inverse)
         
-        # Coeficiente de correlación
-        correlation = np.corrcoef(predictions, actuals)[0, 1]
+        bias = self.bias[unique]
+        bias += self.learning_rate * (residuals - bias)
+        limit = self.max_bias_fraction * self.baseline[unique]
+        self.bias[unique] = np.clip(bias, -limit, limit)
+        self.residual_count[unique] += 1
+        return len(unique)
+    
+    def predict(self, links):
+        """Latencia esperada de cada enlace (NaN si no hay EWMA)"""
+        indices = self._indices(links)
+        return self.baseline[indices] + self.bias[indices]
+    
+    def save(self, path):
+        """Guarda el modelo en formato .npz"""
+        size = len(self.link_keys)
+        keys = np.array(self.link_keys, dtype=str).reshape(size, 2)
+        np.savez(path, link_keys=keys, baseline=self.baseline[:size], bias=self.bias[:size],
+                 residual_count=self.residual_count[:size], directed=self.directed,
+                 learning_rate=self.learning_rate, max_bias_fraction=self.max_bias_fraction)
+    
+    @classmethod
+    def load(cls, path):
+        """Carga un modelo guardado con save()"""
+        with np.load(path, allow_pickle=False) as data:
+            size = len(data['baseline'])
+            predictor = cls(float(data['learning_rate']), float(data['max_bias_fraction']),
+                            initial_capacity=max(size, 1), directed=bool(data['directed']))
+            predictor._indices([tuple(str(name) for name in key) for key in data['link_keys']])
+            predictor.baseline[:size] = data['baseline']
+            predictor.bias[:size] = data['bias']
+            predictor.residual_count[:size] = data['residual_count']
+        return predictor
+
+class MetricsTimeSeriesStore:
+    """Almacén columnar (NumPy) de series de tiempo de métricas por par de servidores"""
+    
+    COLUMNS = ('latency', 'packet_loss', 'availability', 'jitter')
+    
+    def __init__(self, initial_capacity=1024, retention_seconds=None, max_samples_per_pair=None,
+                 retention_batch=1024):
+        self.retention_seconds = retention_seconds
+        self.max_samples_per_pair = max_samples_per_pair
+        # La retención compacta todas las columnas: se aplica por lotes, no por medición
+        self.retention_batch = retention_batch
+        self._appended_since_retention = 0
+        self._size_after_retention = 0
+        self.pair_keys = []
+        self.pair_index = {}
+        self._size = 0
+        self._pair_ids = np.empty(initial_capacity, dtype=np.int32)
+        self._timestamps = np.empty(initial_capacity, dtype=np.float64)  # Segundos epoch
+        self._columns = {name: np.empty(initial_capacity, dtype=np.float64)
+                         for name in self.COLUMNS}
+    
+    def __len__(self):
+        return self._size
+    
+    @staticmethod
+    def to_epoch_seconds(timestamps):
+        """Convierte marcas ISO 8601 (o datetime) a segundos epoch"""
+        values = np.asarray(timestamps)
+        if values.dtype.kind in 'fiu':
+            return values.astype(np.float64)
+        return values.astype('datetime64[us]').astype(np.int64) / 1e6
+    
+    def _pair_id(self, pair_key):
+        pair_id = self.pair_index.get(pair_key)
+        if pair_id is None:
+            pair_id = len(self.pair_keys)
+            self.pair_index[pair_key] = pair_id
+            self.pair_keys.append(pair_key)
+        return pair_id
+    
+    def _ensure_capacity(self, extra):
+        required = self._size + extra
+        capacity = len(self._timestamps)
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        self._pair_ids = np.resize(self._pair_ids, capacity)
+        self._timestamps = np.resize(self._timestamps, capacity)
+        for name in self.COLUMNS:
+            self._columns[name] = np.resize(self._columns[name], capacity)
+    
+    def extend(self, pair_keys, timestamps, **columns):
+        """Agrega un bloque de mediciones (arreglos del mismo largo)"""
+        pair_ids = np.array([self._pair_id(pair_key) for pair_key in pair_keys], dtype=np.int32)
+        count = len(pair_ids)
+        if count == 0:
+            return
+        self._ensure_capacity(count)
+        block = slice(self._size, self._size + count)
+        self._pair_ids[block] = pair_ids
+        self._timestamps[block] = self.to_epoch_seconds(timestamps)
+        for name in self.COLUMNS:
+            values = np.array(columns.get(name, np.zeros(count)), dtype=np.float64)
+            if name == 'latency':
+                # Latencias nulas o en cero no cuentan (igual que el filtro original)
+                values[values == 0] = np.nan
+            else:
+                values = np.nan_to_num(values, nan=0.0)
+            self._columns[name][block] = values
+        self._size += count
         
-        # R-squared
-        ss_res = np.sum((actuals - predictions) ** 2)
-        ss_tot = np.sum((actuals - np.mean(actuals)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot) if ss_tot > 0 else 0
+        # Compactar cuando lo agregado iguala lo retenido mantiene el costo amortizado O(1)
+        self._appended_since_retention += count
+        # Retención por lotes; para la ventana exacta se llama a apply_retention() directamente
+        if self._appended_since_retention >= max(self.retention_batch,
+                                                 self._size_after_retention):
+            self.apply_retention()
+    
+    def append(self, pair_key, measurement):
+        """Agrega una sola medición en formato diccionario"""
+        self.extend([pair_key], [measurement['timestamp']],
+                    **{name: [measurement.get(name)] for name in self.COLUMNS})
+    
+    def add_metrics_data(self, metrics_data):
+        """Agrega en un solo bloque un diccionario {par: [mediciones]}"""
+        pair_keys = [pair_key for pair_key, measurements in metrics_data.items()
+                     for _ in measurements]
+        records = [m for measurements in metrics_data.values() for m in measurements]
+        self.extend(pair_keys, [m['timestamp'] for m in records],
+                    **{name: [m.get(name) for m in records] for name in self.COLUMNS})
+    
+    @classmethod
+    def from_metrics_data(cls, metrics_data, **kwargs):
+        """Crea el almacén a partir del diccionario {par: [mediciones]}"""
+        store = cls(**kwargs)
+        store.add_metrics_data(metrics_data)
+        return store
+    
+    def save(self, path):
+        """Guarda el almacén en formato binario NumPy (.npz sin comprimir)"""
+        np.savez(path,
+                 pair_keys=np.array(self.pair_keys, dtype=str),
+                 pair_ids=self.column('pair_id'),
+                 timestamps=self.column('timestamp'),
+                 **{name: self.column(name) for name in self.COLUMNS})
+    
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Carga un almacén guardado con save()"""
+        with np.load(path, allow_pickle=False) as data:
+            size = len(data['timestamps'])
+            store = cls(initial_capacity=max(size, 1), **kwargs)
+            store.pair_keys = [str(pair_key) for pair_key in data['pair_keys']]
+            store.pair_index = {pair_key: i for i, pair_key in enumerate(store.pair_keys)}
+            store._pair_ids[:size] = data['pair_ids']
+            store._timestamps[:size] = data['timestamps']
+            for name in cls.COLUMNS:
+                store._columns[name][:size] = data[name]
+            store._size = size
+        store.apply_retention()
+        return store
+    
+    def column(self, name):
+        """Vista de una columna (sin copiar)"""
+        if name == 'timestamp':
+            return self._timestamps[:self._size]
+        if name == 'pair_id':
+            return self._pair_ids[:self._size]
+        return self._columns[name][:self._size]
+    
+    def _keep(self, mask):
+        kept = int(mask.sum())
+        self._pair_ids[:kept] = self._pair_ids[:self._size][mask]
+        self._timestamps[:kept] = self._timestamps[:self._size][mask]
+        for name in self.COLUMNS:
+            self._columns[name][:kept] = self._columns[name][:self._size][mask]
+        self._size = kept
+    
+    def apply_retention(self, now=None):
+        """Descarta mediciones más antiguas que la retención o que exceden el límite por par"""
+        self._appended_since_retention = 0
+        self._size_after_retention = self._size
+        if self._size == 0:
+            return
+        mask = np.ones(self._size, dtype=bool)
+        if self.retention_seconds is not None:
+            now = self.column('timestamp').max() if now is None else now
+            mask &= self.column('timestamp') >= now - self.retention_seconds
+        if self.max_samples_per_pair is not None:
+            # Posición de cada medición contando desde la más reciente de su par
+            order = np.lexsort((-self.column('timestamp'), self.column('pair_id')))
+            sorted_ids = self.column('pair_id')[order]
+            group_start = np.searchsorted(sorted_ids, sorted_ids, side='left')
+            rank = np.empty(self._size, dtype=np.int64)
+            rank[order] = np.arange(self._size) - group_start
+            mask &= rank < self.max_samples_per_pair
+        if not mask.all():
+            self._keep(mask)
+            self._size_after_retention = self._size
+    
+    def downsample(self, bucket_seconds, older_than_seconds=0, now=None):
+        """Reemplaza las mediciones antiguas por promedios por par y por intervalo"""
+        if self._size == 0:
+            return
+        timestamps = self.column('timestamp')
+        now = timestamps.max() if now is None else now
+        old = timestamps < now - older_than_seconds
+        if not old.any():
+            return
         
-        return {
-            'mae': round(mae, 3),
-            'rmse': round(rmse, 3),
-            'mape': round(mape, 2),
-            'correlation': round(correlation, 3),
-            'r_squared': round(r_squared, 3),
-            'sample_size': len(self.predictions)
-        }
+        pair_ids = self.column('pair_id')[old]
+        buckets = np.floor(timestamps[old] / bucket_seconds).astype(np.int64)
+        groups, inverse = np.unique(np.stack([pair_ids.astype(np.int64), buckets]),
+                                    axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+        group_count = groups.shape[1]
+        
+        aggregated = {}
+        for name in self.COLUMNS:
+            values = self.column(name)[old]
+            valid = ~np.isnan(values)
+            totals = np.bincount(inverse, weights=np.where(valid, values, 0.0),
+                                 minlength=group_count)
+            counts = np.bincount(inverse, weights=valid, minlength=group_count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                aggregated[name] = np.where(counts > 0, totals / counts, np.nan)
+        bucket_times = np.bincount(inverse, weights=timestamps[old], minlength=group_count)
+        bucket_times /= np.bincount(inverse, minlength=group_count)
+        
+        # Se conservan las mediciones recientes y se agregan los promedios
+        recent = {name: self.column(name)[~old].copy() for name in self.COLUMNS}
+        recent_ids = self.column('pair_id')[~old].copy()
+        recent_times = timestamps[~old].copy()
+        self._size = 0
+        self._ensure_capacity(group_count + len(recent_ids))
+        for pair_ids_block, times_block, columns_block in (
+                (groups[0].astype(np.int32), bucket_times, aggregated),
+                (recent_ids, recent_times, recent)):
+            block = slice(self._size, self._size + len(pair_ids_block))
+            self._pair_ids[block] = pair_ids_block
+            self._timestamps[block] = times_block
+            for name in self.COLUMNS:
+                self._columns[name][block] = columns_block[name]
+            self._size += len(pair_ids_block)
+    
+    def aggregate_columns(self, window_seconds=None, now=None, ewma_halflife=300.0,
+                          percentiles=(50, 95, 99)):
+        """Agregados vectorizados por par: media, EWMA, percentiles y jitter"""
+        pair_count = len(self.pair_keys)
+        timestamps = self.column('timestamp')
+        pair_ids = self.column('pair_id')
+        if self._size:
+            now = timestamps.max() if now is None else now
+        mask = np.ones(self._size, dtype=bool)
+        if window_seconds is not None and self._size:
+            mask = timestamps >= now - window_seconds
+        
+        ids = pair_ids[mask]
+        times = timestamps[mask]
+        result = {'count': np.bincount(ids, minlength=pair_count)}
+        
+        def grouped_mean(values, weights=None):
+            valid = ~np.isnan(values)
+            weights = valid.astype(float) if weights is None else np.where(valid, weights, 0.0)
+            totals = np.bincount(ids, weights=np.where(valid, values, 0.0) * weights,
+                                 minlength=pair_count)
+            norms = np.bincount(ids, weights=weights, minlength=pair_count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(norms > 0, totals / norms, np.nan)
+        
+        for name in self.COLUMNS:
+            result[name] = grouped_mean(self.column(name)[mask])
+        
+        latency = self.column('latency')[mask]
+        
+        # EWMA temporal: cada muestra pesa exp(-ln2 · antigüedad / vida media)
+        if len(times):
+            decay = np.exp(-np.log(2) * (now - times) / ewma_halflife)
+            result['latency_ewma'] = grouped_mean(latency, decay)
+        else:
+            result['latency_ewma'] = np.full(pair_count, np.nan)
+        
+        # Jitter como desviación estándar de la latencia dentro de la ventana
+        mean_square = grouped_mean(latency ** 2)
+        result['latency_std'] = np.sqrt(np.maximum(mean_square - result['latency'] ** 2, 0))
+        
+        # Percentiles por par ordenando una sola vez por (par, latencia)
+        valid = ~np.isnan(latency)
+        valid_ids, valid_latency = ids[valid], latency[valid]
+        order = np.lexsort((valid_latency, valid_ids))
+        sorted_latency = valid_latency[order]
+        counts = np.bincount(valid_ids, minlength=pair_count)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        for q in percentiles:
+            position = starts + (q / 100.0) * np.maximum(counts - 1, 0)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, starts + np.maximum(counts - 1, 0)).astype(np.int64)
+            if len(sorted_latency):
+                lower_values = sorted_latency[np.minimum(lower, len(sorted_latency) - 1)]
+                upper_values = sorted_latency[np.minimum(upper, len(sorted_latency) - 1)]
+                values = lower_values + (position - lower) * (upper_values - lower_values)
+            else:
+                values = np.zeros(pair_count)
+            result[f'latency_p{q}'] = np.where(counts > 0, values, np.nan)
+        
+        return list(self.pair_keys), result
+    
+    def aggregate(self, window_seconds=None, now=None, ewma_halflife=300.0,
+                  percentiles=(50, 95, 99)):
+        """Agregados por par en formato {par: {métrica: valor}}"""
+        pair_keys, columns = self.aggregate_columns(window_seconds, now, ewma_halflife,
+                                                    percentiles)
+        return {pair_key: {name: float(values[i]) if name != 'count' else int(values[i])
+                           for name, values in columns.items()}
+                for i, pair_key in enumerate(pair_keys) if columns['count'][i] > 0}
+    
+    def time_profiles(self, bucket_seconds=3600, period_seconds=86400, window_seconds=None,
+                      now=None):
+        """Promedios por par y por franja del periodo (p. ej. por hora del día) en hora local"""
+        bucket_count = int(np.ceil(period_seconds / bucket_seconds))
+        pair_count = len(self.pair_keys)
+        timestamps = self.column('timestamp')
+        mask = np.ones(self._size, dtype=bool)
+        if window_seconds is not None and self._size:
+            now = timestamps.max() if now is None else now
+            mask = timestamps >= now - window_seconds
+        
+        ids = self.column('pair_id')[mask].astype(np.int64)
+        buckets = (np.mod(timestamps[mask], period_seconds) // bucket_seconds).astype(np.int64)
+        cells = ids * bucket_count + buckets
+        cell_count = pair_count * bucket_count
+        
+        counts = np.bincount(cells, minlength=cell_count).reshape(pair_count, bucket_count)
+        profiles = {}
+        for name in ('latency', 'packet_loss', 'availability'):
+            values = self.column(name)[mask]
+            valid = ~np.isnan(values)
+            totals = np.bincount(cells, weights=np.where(valid, values, 0.0),
+                                 minlength=cell_count).reshape(pair_count, bucket_count)
+            norms = np.bincount(cells, weights=valid,
+                                minlength=cell_count).reshape(pair_count, bucket_count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = totals / norms
+                overall = totals.sum(axis=1) / norms.sum(axis=1)
+            # Las franjas sin mediciones toman el promedio global del par
+            profiles[name] = np.where(norms > 0, means, overall[:, np.newaxis])
+        
+        return {pair_key: {'latency': profiles['latency'][i],
+                           'packet_loss': profiles['packet_loss'][i],
+                           'availability': profiles['availability'][i],
+                           'count': counts[i]}
+                for i, pair_key in enumerate(self.pair_keys) if counts[i].any()}
+    
+    def averaged_metrics(self, window_seconds=None, now=None):
+        """Promedios de latencia, pérdida y disponibilidad por par (entrada del grafo)"""
+        return {pair_key: {'latency': stats['latency'],
+                           'packet_loss': stats['packet_loss'],
+                           'availability': stats['availability']}
+                for pair_key, stats in self.aggregate(window_seconds, now).items()}
+
+class MetricsStreamWriter:
+    """Escritor incremental de métricas en formato JSON Lines (un registro por línea)"""
+    
+    def __init__(self, path, max_buffered_records=1000):
+        self.path = path
+        self.max_buffered_records = max_buffered_records
+        self.records_written = 0
+        self._buffer = []
+        self._file = open(path, 'a', encoding='utf-8')
+    
+    def write(self, pair_key, measurement):
+        """Agrega una medición al búfer; se vuelca al disco si el búfer se llena"""
+        self._buffer.append(json.dumps({'server_pair': pair_key, **measurement}))
+        if len(self._buffer) >= self.max_buffered_records:
+            self.flush()
+    
+    def flush(self):
+        """Escribe el búfer y fuerza la sincronización con el disco"""
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self.records_written += len(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @staticmethod
+    def read_records(path):
+        """Lee los registros de un archivo JSON Lines, ignorando líneas truncadas"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Línea {line_number} inválida en {path}, se omite")
+    
+    @staticmethod
+    def read_dataframe(path):
+        """Carga un archivo JSON Lines como DataFrame"""
+        return pd.DataFrame(list(MetricsStreamWriter.read_records(path)))
+    
+    @staticmethod
+    def read_metrics_data(path):
+        """Reconstruye el diccionario {par: [mediciones]} a partir del archivo"""
+        metrics_data = {}
+        for record in MetricsStreamWriter.read_records(path):
+            pair_key = record.pop('server_pair')
+            metrics_data.setdefault(pair_key, []).append(record)
+        return metrics_data
+
+class TopologyConfig:
+    """Topología de red: nodos con su dirección, enlaces permitidos y grupos"""
+    
+    _cache = {}  # (ruta, mtime) -> topología ya validada
+    
+    def __init__(self, nodes, links=None, groups=None):
+        self.nodes = dict(nodes)
+        self.links = None if links is None else [tuple(link) for link in links]
+        self.groups = {name: list(members) for name, members in (groups or {}).items()}
+    
+    def copy(self):
+        """Copia independiente (el constructor copia nodos, enlaces y grupos)"""
+        return TopologyConfig(self.nodes, self.links, self.groups)
+    
+    @classmethod
+    def from_dict(cls, data, validate=True):
+        """Crea la topología desde un diccionario (formato nuevo o {nombre: IP} heredado)"""
+        if 'nodes' not in data:
+            # Formato heredado: {nombre: IP} en malla completa
+            topology = cls(data)
+        else:
+            nodes = data['nodes']
+            groups = {name: list(members) for name, members in data.get('groups', {}).items()}
+            if isinstance(nodes, list):
+                # Lista de {"name", "address", "group"}
+                entries = nodes
+                nodes = {}
+                for entry in entries:
+                    nodes[entry.get('name')] = entry.get('address')
+                    if entry.get('group'):
+                        groups.setdefault(entry['group'], []).append(entry.get('name'))
+            
+            links = data.get('links', 'full_mesh')
+            if links == 'full_mesh':
+                links = None
+            if data.get('group_links'):
+                # Enlaces entre todos los miembros de dos grupos
+                links = list(links or [])
+                for group_a, group_b in data['group_links']:
+                    links.extend((a, b) for a in groups.get(group_a, [])
+                                 for b in groups.get(group_b, []) if a != b)
+            topology = cls(nodes, links, groups)
+        
+        if validate:
+            topology.validate()
+        return topology
+    
+    @classmethod
+    def load(cls, path, validate=True):
+        """Carga la topología desde JSON; recargas del mismo archivo sin cambios son inmediatas"""
+        cache_key = (os.path.abspath(path), os.path.getmtime(path))
+        # Siempre una copia: los cambios de un sistema no llegan a otros
+        if cache_key in cls._cache:
+            return cls._cache[cache_key].copy()
+        
+        with open(path, 'r') as f:
+            topology = cls.from_dict(json.load(f), validate=validate)
+        if validate:
+            cls._cache[cache_key] = topology.copy()
+        return topology
+    
+    def validate(self):
+        """Verifica nodos, enlaces y grupos; lanza ValueError con todos los problemas"""
+        errors = []
+        if not self.nodes:
+            errors.append("la topología no define nodos")
+        for name, address in self.nodes.items():
+            if not isinstance(name, str) or not name:
+                errors.append(f"nombre de nodo inválido: {name!r}")
+            elif '-' in name:
+                errors.append(f"el nombre '{name}' no puede contener '-' (separa pares 'origen-destino')")
+            if not isinstance(address, str) or not address:
+                errors.append(f"el nodo '{name}' no tiene dirección")
+        
+        if self.links is not None:
+            seen = set()
+            unique_links = []
+            for link in self.links:
+                if len(link) != 2:
+                    errors.append(f"enlace inválido: {link!r}")
+                    continue
+                a, b = link
+                if a not in self.nodes or b not in self.nodes:
+                    errors.append(f"el enlace {a}-{b} usa un nodo inexistente")
+                elif a == b:
+                    errors.append(f"el enlace {a}-{b} conecta un nodo consigo mismo")
+                elif frozenset(link) not in seen:
+                    seen.add(frozenset(link))
+                    unique_links.append((a, b))
+            self.links = unique_links
+        
+        for group, members in self.groups.items():
+            missing = [member for member in members if member not in self.nodes]
+            if missing:
+                errors.append(f"el grupo '{group}' contiene nodos inexistentes: {missing}")
+        
+        if errors:
+            shown = errors[:20]
+            if len(errors) > len(shown):
+                shown.append(f"... y {len(errors) - len(shown)} problemas más")
+            raise ValueError("Topología inválida: " + "; ".join(shown))
+    
+    def link_pairs(self):
+        """Pares de nodos que se pueden medir y enlazar en el grafo"""
+        if self.links is None:
+            names = list(self.nodes)
+            return [(names[i], names[j]) for i in range(len(names))
+                    for j in range(i + 1, len(names))]
+        return list(self.links)
 
 class NetworkOptimizationSystem:
     """Sistema principal de optimización de rutas de red"""
     
-    def __init__(self):
+    def __init__(self, config_path='server_config.json', probe_backend=None,
+                 latency_model_path='latency_model.npz'):
         # Configuración de servidores
-        self.servers = {
+        self.default_servers = {
             'Google_Cloud': '8.8.8.8',  # DNS de Google como ejemplo
             'AWS': '1.1.1.1',          # Cloudflare DNS como ejemplo
             'Azure': '208.67.222.222',  # OpenDNS como ejemplo
             'Oracle_Cloud': '9.9.9.9',  # Quad9 DNS como ejemplo
             'Exadata_X11': '4.4.4.4'   # Level3 DNS como ejemplo
         }
+        self.topology = self.load_server_config(config_path)
+        self.servers = self.topology.nodes
         
-        self.collector = NetworkMetricsCollector(self.servers)
+        self.collector = NetworkMetricsCollector(
+            self.servers, ConcurrentProbeEngine(backend=probe_backend))
         self.optimizer = NetworkGraphOptimizer()
         self.validator = ResultValidator()
+        self.metrics_store = None
+        self.refresh_lock = threading.Lock()
+        self.refresh_thread = None
+        self.refresh_cancelled = threading.Event()
+        self.probe_scheduler = None
+        self.pareto_routing = False  # Añadir frentes de Pareto a los resultados
+        self.time_profile_settings = None  # Franjas para el enrutamiento dependiente del tiempo
+        # Los sesgos aprendidos contra una red simulada no deben llegar a una real:
+        # en simulación el modelo vive solo en memoria
+        self.latency_model_path = (None if isinstance(probe_backend, SimulatedNetworkBackend)
+                                   else latency_model_path)
+        self.latency_predictor = self.load_latency_model()
+    
+    def load_latency_model(self):
+        """Carga el modelo de latencia aprendido en ejecuciones anteriores, si existe"""
+        directed = self.optimizer.graph.is_directed()
+        if self.latency_model_path and os.path.exists(self.latency_model_path):
+            try:
+                predictor = LatencyPredictor.load(self.latency_model_path)
+                if predictor.directed != directed:
+                    raise ValueError("el modelo se aprendió con otra orientación de enlaces")
+                logging.info(f"Modelo de latencia cargado: {len(predictor)} enlaces")
+                return predictor
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"No se pudo cargar el modelo de latencia: {e}")
+        return LatencyPredictor(directed=directed)
     
-    def load_server_config(self):
+    def load_server_config(self, config_path='server_config.json'):
         """Carga configuración de servidores desde archivo JSON"""
         try:
-            with open('server_config.json', 'r') as f:
-                return json.load(f)
+            topology = TopologyConfig.load(config_path)
+            logging.info(f"Topología cargada desde {config_path}: {len(topology.nodes)} nodos, "
+                         f"{len(topology.link_pairs())} enlaces permitidos")
+            return topology
         except FileNotFoundError:
             logging.warning("Archivo de configuración no encontrado, usando configuración por defecto")
-            return self.servers
+            return TopologyConfig(self.default_servers)
     
-    def collect_comprehensive_metrics(self, duration_hours=1):
+    def collect_comprehensive_metrics(self, duration_hours=1, cycle_interval=30,
+                                      max_samples_per_pair=1000):
         """Recolecta métricas comprehensivas durante período especificado"""
         logging.info(f"Iniciando recolección de métricas por {duration_hours} horas")
         
-        all_metrics = {}
-        server_pairs = []
-        
-        # Generar todas las combinaciones de pares de servidores
-        server_list = list(self.servers.keys())
-        for i in range(len(server_list)):
-            for j in range(i + 1, len(server_list)):
-                server_pairs.append((server_list[i], server_list[j]))
+        # Almacén acotado por enlace: la memoria no crece con la duración
+        store = MetricsTimeSeriesStore(max_samples_per_pair=max_samples_per_pair)
+        server_pairs = self.server_pairs()
         
         start_time = datetime.now()
         end_time = start_time + timedelta(hours=duration_hours)
         measurement_count = 0
         max_measurements = 10  # Limitar mediciones para demo
+        availability_window_hours = 0.1
+        
+        # Iniciar el muestreo de disponibilidad en segundo plano
+        self.collector.seed_availability([self.servers[destination]
+                                          for _, destination in server_pairs],
+                                         duration_hours=availability_window_hours)
+        self.collector.availability_monitor.start()
+        
+        # Las mediciones se escriben al disco en cada ciclo
+        self.metrics_stream_path = f'metrics_data_{start_time.strftime("%Y%m%d_%H%M%S")}.jsonl'
+        try:
+            with MetricsStreamWriter(self.metrics_stream_path) as stream:
+                while datetime.now() < end_time and measurement_count < max_measurements:
+                    cycle_pairs = self.pairs_for_cycle()
+                    cycle_metrics = self.collect_metrics_cycle(cycle_pairs,
+                                                               availability_window_hours)
+                    
+                    # Solo se agregan los pares con datos válidos
+                    for pair_key, measurement in cycle_metrics.items():
+                        stream.write(pair_key, measurement)
+                    stream.flush()
+                    store.add_metrics_data({pair_key: [measurement]
+                                            for pair_key, measurement in cycle_metrics.items()})
+                    store.apply_retention()
+                    
+                    measurement_count += 1
+                    if measurement_count < max_measurements and cycle_interval > 0:
+                        time.sleep(cycle_interval)  # Pausa entre ciclos de medición
+        finally:
+            # El hilo de disponibilidad no debe sobrevivir a un error de sondeo
+            self.collector.availability_monitor.stop()
+        
+        # Instantánea binaria para arranques en caliente
+        store.save(self.metrics_stream_path.replace('.jsonl', '.npz'))
+        
+        logging.info(f"{stream.records_written} mediciones guardadas en {self.metrics_stream_path}")
+        return store
+    
+    def server_pairs(self):
+        """Pares de servidores a medir (enlaces permitidos por la topología)"""
+        return self.topology.link_pairs()
+    
+    def enable_sparse_probing(self, budget_fraction=0.2, **kwargs):
+        """Mide solo una fracción de los enlaces por ciclo y estima el resto"""
+        self.probe_scheduler = ProbeScheduler(self.server_pairs(), budget_fraction, **kwargs)
+        logging.info(f"Sondeo disperso activado: {self.probe_scheduler.budget} de "
+                     f"{len(self.probe_scheduler.pairs)} enlaces por ciclo")
+        return self.probe_scheduler
+    
+    def pairs_for_cycle(self):
+        """Pares a medir en el próximo ciclo (todos, o los elegidos por el planificador)"""
+        if self.probe_scheduler is None:
+            return self.server_pairs()
+        return self.probe_scheduler.select()
+    
+    def enable_time_dependent_routing(self, bucket_seconds=3600, period_seconds=86400):
+        """Precalcula perfiles de enlace por franja (por defecto, por hora del día)"""
+        self.time_profile_settings = {'bucket_seconds': bucket_seconds,
+                                      'period_seconds': period_seconds}
+        if self.metrics_store is not None and self.optimizer.graph.number_of_edges():
+            self.refresh_time_profiles()
+    
+    def refresh_time_profiles(self):
+        """Recalcula los perfiles por franja a partir del almacén de métricas"""
+        if self.time_profile_settings is None or self.metrics_store is None:
+            return
+        profiles = self.metrics_store.time_profiles(**self.time_profile_settings)
+        self.optimizer.set_time_profiles(profiles, **self.time_profile_settings)
+    
+    def estimate_missing_links(self, averaged_metrics):
+        """Completa los enlaces permitidos sin mediciones a partir de los medidos"""
+        measured, missing = [], []
+        for source, destination in self.server_pairs():
+            if (f"{source}-{destination}" in averaged_metrics
+                    or f"{destination}-{source}" in averaged_metrics):
+                measured.append((source, destination))
+            else:
+                missing.append((source, destination))
+        if not missing or not measured:
+            return averaged_metrics
+        
+        def metrics_for(pair):
+            return (averaged_metrics.get(f"{pair[0]}-{pair[1]}")
+                    or averaged_metrics[f"{pair[1]}-{pair[0]}"])
+        
+        measured_metrics = [metrics_for(pair) for pair in measured]
+        latencies = np.array([m['latency'] for m in measured_metrics], dtype=float)
+        valid = ~np.isnan(latencies)
+        
+        # Latencia: coordenadas de red ajustadas con los enlaces medidos
+        coordinates = LatencyCoordinates(list(self.servers))
+        coordinates.fit([pair for pair, ok in zip(measured, valid) if ok], latencies[valid])
+        estimated_latencies = coordinates.estimate(missing)
         
-        while datetime.now() < end_time and measurement_count < max_measurements:
-            timestamp = datetime.now().isoformat()
+        # Pérdida y disponibilidad: promedio de los enlaces medidos de cada extremo
+        node_index = coordinates.node_index
+        ends = np.array([[node_index[a], node_index[b]] for a, b in measured]).ravel()
+        node_count = len(node_index)
+        degree = np.bincount(ends, minlength=node_count)
+        node_means = {}
+        for name in ('packet_loss', 'availability'):
+            values = np.repeat([m[name] for m in measured_metrics], 2)
+            totals = np.bincount(ends, weights=values, minlength=node_count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                node_means[name] = np.where(degree > 0, totals / degree, np.mean(values))
+        
+        completed = dict(averaged_metrics)
+        for (source, destination), latency in zip(missing, estimated_latencies):
+            i, j = node_index[source], node_index[destination]
+            completed[f"{source}-{destination}"] = {
+                'latency': float(latency),
+                'packet_loss': float((node_means['packet_loss'][i] + node_means['packet_loss'][j]) / 2),
+                'availability': float((node_means['availability'][i] + node_means['availability'][j]) / 2),
+                'estimated': True
+            }
+        
+        logging.info(f"{len(missing)} enlaces sin medición estimados a partir de {len(measured)} medidos")
+        return completed
+    
+    @instrumentation.timed()
+    def collect_metrics_cycle(self, server_pairs, availability_window_hours=0.1):
+        """Ejecuta un ciclo de medición y devuelve {par: medición} de los pares con datos"""
+        timestamp = datetime.now().isoformat()
+        
+        # Sondear todos los pares del ciclo en paralelo
+        ip_pairs = [(self.servers[source], self.servers[destination])
+                    for source, destination in server_pairs]
+        cycle_latencies = self.collector.collect_latency_batch(ip_pairs, samples=10)
+        
+        cycle_metrics = {}
+        probe_results = {}
+        for source, destination in server_pairs:
+            source_ip = self.servers[source]
+            dest_ip = self.servers[destination]
             
-            for source, destination in server_pairs:
-                source_ip = self.servers[source]
-                dest_ip = self.servers[destination]
-                
-                # Recolectar métricas
-                metrics = self.collector.collect_latency(source_ip, dest_ip, samples=3)
-                availability = self.collector.measure_availability(dest_ip, duration_hours=0.1)
-                
+            # Recolectar métricas
+            metrics = cycle_latencies[(source_ip, dest_ip)]
+            availability = self.collector.measure_availability(
+                dest_ip, duration_hours=availability_window_hours)
+            
+            if metrics['avg_latency']:  # Solo agregar si hay datos válidos
                 pair_key = f"{source}-{destination}"
-                if pair_key not in all_metrics:
-                    all_metrics[pair_key] = []
+                probe_results[(source, destination)] = metrics['avg_latency']
+                cycle_metrics[pair_key] = {
+                    'timestamp': timestamp,
+                    'latency': metrics['avg_latency'],
+                    'packet_loss': metrics['packet_loss'],
+                    'availability': availability,
+                    'jitter': metrics['std_latency'] if metrics['std_latency'] else 0
+                }
                 
-                if metrics['avg_latency']:  # Solo agregar si hay datos válidos
-                    all_metrics[pair_key].append({
-                        'timestamp': timestamp,
-                        'latency': metrics['avg_latency'],
-                        'packet_loss': metrics['packet_loss'],
-                        'availability': availability,
-                        'jitter': metrics['std_latency'] if metrics['std_latency'] else 0
-                    })
-                    
-                    logging.info(f"Métricas recolectadas para {pair_key}: "
-                               f"Latencia={metrics['avg_latency']:.2f}ms, "
-                               f"Pérdida={metrics['packet_loss']:.1f}%, "
-                               f"Disponibilidad={availability:.1f}%")
+                logging.info(f"Métricas recolectadas para {pair_key}: "
+                           f"Latencia={metrics['avg_latency']:.2f}ms, "
+                           f"Pérdida={metrics['packet_loss']:.1f}%, "
+                           f"Disponibilidad={availability:.1f}%")
+        
+        if self.probe_scheduler is not None:
+            self.probe_scheduler.record(server_pairs, probe_results)
+        
+        return cycle_metrics
+    
+    def load_latest_metrics(self, directory='.'):
+        """Carga las métricas de la ejecución más reciente (.npz, .jsonl o .json)"""
+        candidates = []
+        for extension in ('npz', 'jsonl', 'json'):
+            candidates.extend(glob.glob(os.path.join(directory, f'metrics_data_*.{extension}')))
+        if not candidates:
+            logging.warning("No hay métricas persistidas de ejecuciones anteriores")
+            return None
+        
+        # Ejecución más reciente; dentro de ella se prefiere el formato binario
+        latest = max(candidates, key=os.path.getmtime)
+        stem = os.path.splitext(latest)[0]
+        for extension in ('npz', 'jsonl', 'json'):
+            path = f'{stem}.{extension}'
+            if path not in candidates:
+                continue
+            try:
+                if extension == 'npz':
+                    store = MetricsTimeSeriesStore.load(path)
+                elif extension == 'jsonl':
+                    store = MetricsTimeSeriesStore.from_metrics_data(
+                        MetricsStreamWriter.read_metrics_data(path))
+                else:
+                    with open(path, 'r') as f:
+                        store = MetricsTimeSeriesStore.from_metrics_data(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"No se pudo cargar {path}: {e}")
+                continue
             
-            measurement_count += 1
-            if measurement_count < max_measurements:
-                time.sleep(30)  # Pausa entre ciclos de medición
+            logging.info(f"Métricas cargadas desde {path}: {len(store)} mediciones")
+            return store
         
-        # Guardar datos recolectados
-        self.save_metrics_data(all_metrics)
-        return all_metrics
+        return None
     
-    def save_metrics_data(self, metrics_data):
-        """Guarda datos de métricas en formato CSV y JSON"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def warm_start(self, refresh_in_background=True, duration_hours=0.5, cycle_interval=30):
+        """Optimiza con las últimas métricas guardadas y, opcionalmente, refresca en segundo plano"""
+        store = self.load_latest_metrics()
+        if store is None or not len(store):
+            return None
         
-        # Guardar en formato JSON
-        with open(f'metrics_data_{timestamp}.json', 'w') as f:
-            json.dump(metrics_data, f, indent=2)
-        
-        # Convertir a DataFrame y guardar CSV
-        records = []
-        for pair_key, measurements in metrics_data.items():
-            for measurement in measurements:
-                record = {
-                    'server_pair': pair_key,
-                    **measurement
-                }
-                records.append(record)
+        with self.refresh_lock:
+            results = self.process_and_analyze(store)
         
-        if records:
-            df = pd.DataFrame(records)
-            df.to_csv(f'metrics_data_{timestamp}.csv', index=False)
+        if refresh_in_background:
+            self.refresh_thread = threading.Thread(target=self.refresh_metrics,
+                                                   args=(duration_hours, cycle_interval),
+                                                   name='metrics-refresh', daemon=True)
+            self.refresh_thread.start()
         
-        logging.info(f"Datos guardados en metrics_data_{timestamp}.json y .csv")
+        return results
+    
+    def stop_refresh(self):
+        """Interrumpe la recolección en segundo plano descartando los sondeos en cola"""
+        if self.refresh_thread is None or not self.refresh_thread.is_alive():
+            return
+        self.refresh_cancelled.set()
+        self.collector.availability_monitor.stop(wait=False)
+        self.collector.probe_engine.shutdown(wait=False, cancel_pending=True)
+    
+    def refresh_metrics(self, duration_hours=0.5, cycle_interval=30):
+        """Recolecta métricas nuevas y actualiza el grafo con ellas"""
+        try:
+            store = self.collect_comprehensive_metrics(duration_hours, cycle_interval)
+        except (CancelledError, RuntimeError):
+            # El motor de sondeo se cerró desde stop_refresh()
+            if not self.refresh_cancelled.is_set():
+                raise
+            logging.info("Recolección en segundo plano interrumpida")
+            return None
+        if len(store):
+            with self.refresh_lock:
+                return self.process_and_analyze(store)
+        return None
     
+    @instrumentation.timed()
     def process_and_analyze(self, metrics_data):
         """Procesa datos y ejecuta análisis de optimización"""
         logging.info("Procesando datos y construyendo grafo de red")
         
-        # Calcular promedios por par de servidores
-        averaged_metrics = {}
-        for pair_key, measurements in metrics_data.items():
-            if measurements:  # Verificar que hay datos
-                avg_latency = np.mean([m['latency'] for m in measurements if m['latency']])
-                avg_packet_loss = np.mean([m['packet_loss'] for m in measurements])
-                avg_availability = np.mean([m['availability'] for m in measurements])
-                
-                averaged_metrics[pair_key] = {
-                    'latency': avg_latency,
-                    'packet_loss': avg_packet_loss,
-                    'availability': avg_availability
-                }
+        # Calcular promedios por par de servidores sobre el almacén columnar
+        if isinstance(metrics_data, MetricsTimeSeriesStore):
+            self.metrics_store = metrics_data
+        else:
+            self.metrics_store = MetricsTimeSeriesStore.from_metrics_data(metrics_data)
+        averaged_metrics = self.metrics_store.averaged_metrics()
         
-        # Construir grafo de red
-        self.optimizer.build_network_graph(averaged_metrics)
+        # Construir grafo de red (o actualizar solo las aristas que cambiaron)
+        self.update_network_graph(averaged_metrics)
+        self.refresh_time_profiles()
+        server_list = list(self.servers.keys())
         
         # Análisis de rutas para todas las combinaciones
         results = {}
-        server_list = list(self.servers.keys())
+        
+        # Rutas óptimas de todos los pares (una búsqueda por nodo origen)
+        optimal_routes = self.optimizer.find_all_optimal_routes(server_list)
+        if self.probe_scheduler is not None:
+            self.probe_scheduler.update_criticality(optimal_routes)
+        
+        # Frentes de Pareto (latencia, disponibilidad, pérdida) calculados en paralelo
+        pareto_fronts = (self.optimizer.find_all_pareto_routes(server_list)
+                         if self.pareto_routing else None)
         
         for source in server_list:
             for destination in server_list:
@@ -424,7 +3151,7 @@ class NetworkOptimizationSystem:
                     route_key = f"{source}_to_{destination}"
                     
                     # Encontrar ruta óptima
-                    optimal_route = self.optimizer.find_optimal_route(source, destination)
+                    optimal_route = optimal_routes.get((source, destination))
                     
                     if optimal_route:
                         # Comparar con rutas alternativas
@@ -434,28 +3161,88 @@ class NetworkOptimizationSystem:
                             'optimal_route': optimal_route,
                             'alternatives': route_comparison
                         }
+                        if pareto_fronts is not None:
+                            results[route_key]['pareto_front'] = pareto_fronts.get(
+                                (source, destination), [])
                         
                         logging.info(f"Ruta óptima {source} → {destination}: "
                                    f"{' → '.join(optimal_route['path'])}")
         
         return results
     
+    def update_network_graph(self, averaged_metrics):
+        """Construye el grafo la primera vez y después solo actualiza las aristas que cambian"""
+        server_list = list(self.servers.keys())
+        allowed_links = self.server_pairs()
+        if self.probe_scheduler is not None:
+            averaged_metrics = self.estimate_missing_links(averaged_metrics)
+        if self.optimizer.graph.number_of_edges():
+            _, edges = self.optimizer.collect_pair_metrics(averaged_metrics, server_list,
+                                                           allowed_links)
+            self.optimizer.update_edge_metrics({(source, destination): metrics
+                                                for source, destination, metrics in edges})
+        else:
+            self.optimizer.build_network_graph(averaged_metrics, server_list, allowed_links)
+        self.apply_latency_model()
+    
+    def apply_latency_model(self):
+        """Fija la latencia prevista de cada arista: EWMA reciente más el sesgo aprendido"""
+        graph = self.optimizer.graph
+        links = list(graph.edges)
+        if not links:
+            return
+        baselines = np.array([graph[u][v]['latency'] for u, v in links], dtype=float)
+        
+        # El EWMA del almacén sigue mejor la tendencia que el promedio de la ventana
+        store = self.metrics_store
+        if store is not None and store.pair_keys:
+            _, columns = store.aggregate_columns()
+            ewma = columns['latency_ewma']
+            for position, (u, v) in enumerate(links):
+                pair_id = store.pair_index.get(f"{u}-{v}", store.pair_index.get(f"{v}-{u}"))
+                if pair_id is not None and not np.isnan(ewma[pair_id]):
+                    baselines[position] = ewma[pair_id]
+        
+        self.latency_predictor.update_baseline(links, baselines)
+        estimates = np.maximum(self.latency_predictor.predict(links), 0)
+        self.optimizer.apply_latency_estimates(dict(zip(links, estimates)))
+    
+    def learn_latency_residuals(self, hop_latencies):
+        """Ajusta el sesgo por enlace con los saltos medidos en la validación"""
+        links = [link for link, latency in hop_latencies.items() if latency is not None]
+        if not links:
+            return
+        learned = self.latency_predictor.learn(links, [hop_latencies[link] for link in links])
+        self.apply_latency_model()
+        if self.latency_model_path:
+            try:
+                self.latency_predictor.save(self.latency_model_path)
+            except OSError as e:
+                logging.warning(f"No se pudo guardar el modelo de latencia: {e}")
+        logging.info(f"Modelo de latencia ajustado con {learned} enlaces validados")
+    
+    @instrumentation.timed()
     def validate_results(self, optimization_results):
         """Valida resultados mediante mediciones reales"""
         logging.info("Iniciando validación de resultados")
         
         validation_summary = []
         
+        # Medir una sola vez, en paralelo, cada salto distinto de todas las rutas
+        hop_latencies = self.measure_hop_latencies(
+            route_data['optimal_route']['path'] for route_data in optimization_results.values())
+        
         for route_key, route_data in optimization_results.items():
             optimal_route = route_data['optimal_route']
             predicted_latency = optimal_route['estimated_latency']
             
             # Medir latencia real de la ruta recomendada
             path = optimal_route['path']
-            actual_latency = self.measure_actual_route_latency(path)
+            actual_latency = self.measure_actual_route_latency(path, hop_latencies)
             
             if actual_latency:
-                validation = self.validator.validate_prediction(predicted_latency, actual_latency)
+                validation = self.validator.validate_prediction(predicted_latency, actual_latency,
+                                                                route=route_key)
                 validation['route'] = route_key
                 validation['path'] = ' → '.join(path)
                 validation_summary.append(validation)
@@ -465,13 +3252,43 @@ class NetworkOptimizationSystem:
                            f"Real={actual_latency:.2f}ms, "
                            f"Error={validation['percentage_error']:.2f}%")
         
+        # Los residuos por salto corrigen las predicciones de las próximas consultas
+        self.learn_latency_residuals(hop_latencies)
+        
         # Calcular métricas agregadas
         aggregate_metrics = self.validator.calculate_aggregate_metrics()
         
         return validation_summary, aggregate_metrics
     
-    def measure_actual_route_latency(self, path):
+    @instrumentation.timed()
+    def measure_hop_latencies(self, paths, samples=10):
+        """Mide en paralelo cada salto único de un conjunto de rutas"""
+        hops = {}
+        for path in paths:
+            for i in range(len(path) - 1):
+                source_server, dest_server = path[i], path[i + 1]
+                if source_server in self.servers and dest_server in self.servers:
+                    # A→B y B→A se consideran el mismo enlace
+                    if (dest_server, source_server) not in hops:
+                        hops[(source_server, dest_server)] = (self.servers[source_server],
+                                                              self.servers[dest_server])
+        
+        measurements = self.collector.collect_latency_batch(hops.values(), samples=samples)
+        
+        hop_latencies = {}
+        for (source_server, dest_server), ip_pair in hops.items():
+            avg_latency = measurements[ip_pair]['avg_latency']
+            hop_latencies[(source_server, dest_server)] = avg_latency
+            hop_latencies[(dest_server, source_server)] = avg_latency
+        
+        logging.info(f"Validación: {len(hops)} enlaces únicos medidos")
+        return hop_latencies
+    
+    def measure_actual_route_latency(self, path, hop_latencies=None):
         """Mide latencia real de una ruta específica"""
+        if hop_latencies is None:
+            hop_latencies = self.measure_hop_latencies([path])
+        
         total_latency = 0
         
         for i in range(len(path) - 1):
@@ -479,12 +3296,9 @@ class NetworkOptimizationSystem:
             dest_server = path[i + 1]
             
             if source_server in self.servers and dest_server in self.servers:
-                source_ip = self.servers[source_server]
-                dest_ip = self.servers[dest_server]
-                
-                metrics = self.collector.collect_latency(source_ip, dest_ip, samples=3)
-                if metrics['avg_latency']:
-                    total_latency += metrics['avg_latency']
+                avg_latency = hop_latencies.get((source_server, dest_server))
+                if avg_latency:
+                    total_latency += avg_latency
                 else:
                     return None  # Error en medición
         
@@ -566,29 +3380,323 @@ class NetworkOptimizationSystem:
         except Exception as e:
             logging.error(f"Error creando visualización: {e}")
 
-def main():
+class RouteQueryHandler(BaseHTTPRequestHandler):
+    """Atiende consultas HTTP de rutas: /route, /alternatives, /stats y /health"""
+    
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        daemon = self.server.route_daemon
+        
+        try:
+            if parsed.path == '/health':
+                self.send_json(200, daemon.health())
+            elif parsed.path == '/stats':
+                self.send_json(200, daemon.stats())
+            elif parsed.path in ('/route', '/alternatives'):
+                source, destination = params.get('source'), params.get('destination')
+                if not source or not destination:
+                    self.send_json(400, {'error': "Se requieren 'source' y 'destination'"})
+                    return
+                if parsed.path == '/route':
+                    route = daemon.query_route(source, destination, params.get('at'))
+                else:
+                    route = daemon.query_alternatives(source, destination,
+                                                      int(params.get('k', 3)))
+                if route is None:
+                    self.send_json(404, {'error': f"Sin ruta entre {source} y {destination}"})
+                else:
+                    self.send_json(200, route)
+            else:
+                self.send_json(404, {'error': f"Ruta desconocida: {parsed.path}"})
+        except (KeyError, nx.NodeNotFound) as e:
+            self.send_json(404, {'error': f"Servidor desconocido: {e}"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+    
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=float).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logging.debug(f"HTTP {self.address_string()} - {format % args}")
+
+class RouteDaemon:
+    """Servicio residente: recolecta métricas continuamente y responde consultas de rutas"""
+    
+    def __init__(self, system, host='127.0.0.1', port=8080, cycle_interval=30,
+                 window_seconds=3600, availability_window_hours=0.1):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.cycle_interval = cycle_interval
+        self.window_seconds = window_seconds
+        self.availability_window_hours = availability_window_hours
+        self.lock = threading.RLock()
+        self.cycles_completed = 0
+        self.last_cycle_at = None
+        self.started_at = None
+        self._stop_event = threading.Event()
+        self._collector_thread = None
+        self._server = None
+        self._server_thread = None
+        self._stream = None
+    
+    def start(self):
+        """Prepara el grafo inicial y arranca los hilos de recolección y del servidor HTTP"""
+        self.started_at = datetime.now()
+        
+        # El puerto se reserva antes de medir para fallar pronto si está ocupado
+        self._server = ThreadingHTTPServer((self.host, self.port), RouteQueryHandler)
+        self._server.route_daemon = self
+        
+        # Arranque en caliente si hay métricas guardadas; si no, un primer ciclo de medición
+        store = self.system.load_latest_metrics()
+        if store is None:
+            store = MetricsTimeSeriesStore()
+        store.retention_seconds = self.window_seconds
+        if self.system.time_profile_settings is not None:
+            # Los perfiles por franja necesitan conservar un periodo completo
+            store.retention_seconds = max(self.window_seconds,
+                                          self.system.time_profile_settings['period_seconds'])
+        self.system.metrics_store = store
+        
+        server_pairs = self.system.server_pairs()
+        self.system.collector.seed_availability(
+            [self.system.servers[destination] for _, destination in server_pairs],
+            duration_hours=self.availability_window_hours)
+        self.system.collector.availability_monitor.start()
+        
+        self._stream = MetricsStreamWriter(
+            f'metrics_data_{self.started_at.strftime("%Y%m%d_%H%M%S")}.jsonl')
+        if not len(store):
+            self.run_collection_cycle()
+        else:
+            self.refresh_routes()
+        
+        self._collector_thread = threading.Thread(target=self.collection_loop,
+                                                  name='route-daemon-collector', daemon=True)
+        self._collector_thread.start()
+        
+        self._server_thread = threading.Thread(target=self._server.serve_forever,
+                                               name='route-daemon-http', daemon=True)
+        self._server_thread.start()
+        logging.info(f"Servicio de rutas escuchando en http://{self.host}:{self.port}")
+    
+    def run_forever(self):
+        """Ejecuta el servicio hasta Ctrl+C y devuelve el código de salida"""
+        try:
+            self.start()
+            while not self._stop_event.wait(1):
+                pass
+        except KeyboardInterrupt:
+            logging.info("Deteniendo servicio de rutas")
+        except OSError as e:
+            logging.error(f"No se pudo iniciar el servicio en {self.host}:{self.port}: {e}")
+            print(f"\n❌ No se pudo iniciar el servicio en {self.host}:{self.port}: {e}")
+            return 1
+        finally:
+            self.stop()
+        return 0
+    
+    def stop(self):
+        """Detiene los hilos y cierra el flujo de métricas"""
+        self._stop_event.set()
+        if self._server:
+            if self._server_thread:
+                self._server.shutdown()
+            self._server.server_close()
+        if self._collector_thread:
+            self._collector_thread.join()
+        self.system.collector.availability_monitor.stop()
+        if self._stream:
+            self._stream.close()
+    
+    def collection_loop(self):
+        while not self._stop_event.wait(self.cycle_interval):
+            try:
+                self.run_collection_cycle()
+            except Exception as e:
+                logging.error(f"Error en ciclo de recolección: {e}")
+    
+    def run_collection_cycle(self):
+        """Mide todos los pares, actualiza el almacén y el grafo, y precalcula las rutas"""
+        cycle_metrics = self.system.collect_metrics_cycle(self.system.pairs_for_cycle(),
+                                                          self.availability_window_hours)
+        for pair_key, measurement in cycle_metrics.items():
+            self._stream.write(pair_key, measurement)
+        self._stream.flush()
+        
+        with self.lock:
+            self.system.metrics_store.add_metrics_data(
+                {pair_key: [measurement] for pair_key, measurement in cycle_metrics.items()})
+            self.system.metrics_store.apply_retention()
+            self.refresh_routes()
+            self.cycles_completed += 1
+            self.last_cycle_at = datetime.now()
+    
+    def refresh_routes(self):
+        """Actualiza el grafo con la ventana reciente y deja las rutas listas en caché"""
+        with self.lock:
+            averaged_metrics = self.system.metrics_store.averaged_metrics(self.window_seconds)
+            self.system.update_network_graph(averaged_metrics)
+            self.system.refresh_time_profiles()
+            routes = self.system.optimizer.find_all_optimal_routes(list(self.system.servers))
+            if self.system.probe_scheduler is not None:
+                self.system.probe_scheduler.update_criticality(routes)
+    
+    def query_route(self, source, destination, at=None):
+        with self.lock:
+            if at is not None:
+                return self.system.optimizer.find_route_at(source, destination, at)
+            return self.system.optimizer.find_optimal_route(source, destination)
+    
+    def query_alternatives(self, source, destination, k=3):
+        if k <= 0:
+            raise ValueError("k debe ser positivo")
+        with self.lock:
+            alternatives = self.system.optimizer.compare_routes(source, destination, k=k)
+        return alternatives or None
+    
+    def health(self):
+        return {
+            'status': 'ok',
+            'nodes': self.system.optimizer.graph.number_of_nodes(),
+            'edges': self.system.optimizer.graph.number_of_edges(),
+            'cycles_completed': self.cycles_completed,
+            'last_cycle_at': self.last_cycle_at.isoformat() if self.last_cycle_at else None
+        }
+    
+    def stats(self):
+        return {
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'cycles_completed': self.cycles_completed,
+            'stored_measurements': len(self.system.metrics_store),
+            'route_cache': self.system.optimizer.route_cache.stats(),
+            'counters': dict(instrumentation.counters)
+        }
+
+def parse_arguments(argv=None):
+    """Opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Sistema de selección óptima de rutas")
+    parser.add_argument('--config', default='server_config.json',
+                        help="archivo JSON con la topología (nodos, enlaces y grupos)")
+    parser.add_argument('--probe-budget', type=float, default=None,
+                        help="fracción de enlaces a medir por ciclo (el resto se estima)")
+    parser.add_argument('--warm-start', action='store_true',
+                        help="usar las métricas guardadas más recientes en lugar de recolectar")
+    parser.add_argument('--wait-refresh', action='store_true',
+                        help="con --warm-start, esperar a que termine la recolección en segundo plano")
+    parser.add_argument('--daemon', action='store_true',
+                        help="ejecutar como servicio residente con API HTTP de consultas")
+    parser.add_argument('--host', default='127.0.0.1', help="dirección del servicio HTTP")
+    parser.add_argument('--port', type=int, default=8080, help="puerto del servicio HTTP")
+    parser.add_argument('--cycle-interval', type=float, default=None,
+                        help="segundos entre ciclos de medición (30 por defecto; 0 al recolectar en simulación)")
+    parser.add_argument('--simulate', action='store_true',
+                        help="medir sobre una red simulada reproducible en lugar de hacer ping")
+    parser.add_argument('--seed', type=int, default=0, help="semilla de la red simulada")
+    parser.add_argument('--time-buckets', type=int, default=None, metavar='SEGUNDOS',
+                        help="enrutar con perfiles por franja del día de este tamaño (p. ej. 3600)")
+    parser.add_argument('--latency-model', default='latency_model.npz', metavar='RUTA',
+                        help="archivo del modelo de latencia aprendido (no se usa con --simulate)")
+    parser.add_argument('--pareto', action='store_true',
+                        help="calcular también los frentes de Pareto (latencia, disponibilidad, pérdida)")
+    parser.add_argument('--pareto-approximate', action='store_true',
+                        help="frentes ε-Pareto (escalones de 1%% y 0.5%%, hasta el doble de latencia), "
+                             "más pequeños y rápidos que el exacto")
+    parser.add_argument('--profile', action='store_true',
+                        help="capturar perfil de CPU (cProfile) y de memoria (tracemalloc)")
+    parser.add_argument('--metrics-output', default=None,
+                        help="archivo JSON donde exportar tiempos, contadores e histogramas")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Función principal del sistema"""
+    args = parse_arguments(argv)
+    
     print("=" * 60)
     print("SISTEMA DE SELECCIÓN ÓPTIMA DE RUTAS")
     print("Universidad La Salle Nezahualcóyotl")
     print("=" * 60)
     
     # Inicializar sistema
-    system = NetworkOptimizationSystem()
+    try:
+        probe_backend = SimulatedNetworkBackend(seed=args.seed) if args.simulate else None
+        system = NetworkOptimizationSystem(config_path=args.config, probe_backend=probe_backend,
+                                           latency_model_path=args.latency_model)
+    except ValueError as e:
+        logging.error(f"Configuración inválida: {e}")
+        print(f"\n❌ Error: {e}")
+        return 1
+    
+    if args.probe_budget is not None:
+        system.enable_sparse_probing(budget_fraction=args.probe_budget)
+    system.pareto_routing = args.pareto or args.pareto_approximate
+    if args.pareto_approximate:
+        system.optimizer.pareto_options.update(availability_resolution=1.0, loss_resolution=0.5,
+                                               max_latency_ratio=2.0)
+    if args.time_buckets:
+        system.enable_time_dependent_routing(bucket_seconds=args.time_buckets)
+    
+    if args.daemon:
+        print(f"\n🛰️ Modo servicio: consultas en http://{args.host}:{args.port}/route")
+        cycle_interval = 30 if args.cycle_interval is None else args.cycle_interval
+        exit_code = RouteDaemon(system, host=args.host, port=args.port,
+                                cycle_interval=cycle_interval).run_forever()
+        if args.metrics_output:
+            instrumentation.export(args.metrics_output)
+        return exit_code
+    
+    if args.profile:
+        instrumentation.start_capture()
     
     try:
-        # Fase 1: Recolección de métricas (configurar duración según necesidades)
-        print("\n🔍 Fase 1: Recolectando métricas de red...")
-        metrics_data = system.collect_comprehensive_metrics(duration_hours=0.5)  # 30 minutos para demo
-        
-        # Verificar que se recolectaron datos
-        if not any(metrics_data.values()):
-            print("❌ No se pudieron recolectar métricas válidas")
-            return 1
+        return run_pipeline(system, args)
+    finally:
+        if args.profile:
+            instrumentation.stop_capture(
+                profile_path=f'profile_{datetime.now().strftime("%Y%m%d_%H%M%S")}.prof')
+        if args.metrics_output:
+            instrumentation.export(args.metrics_output)
+
+def run_pipeline(system, args):
+    """Ejecuta las cinco fases del análisis cronometrando cada una"""
+    try:
+        # En simulación no hace falta esperar entre ciclos
+        cycle_interval = args.cycle_interval
+        if cycle_interval is None:
+            cycle_interval = 0 if args.simulate else 30
         
-        # Fase 2: Procesamiento y optimización
-        print("\n⚙️ Fase 2: Procesando datos y optimizando rutas...")
-        optimization_results = system.process_and_analyze(metrics_data)
+        # Fase 1: Recolección de métricas (configurar duración según necesidades)
+        optimization_results = None
+        if args.warm_start:
+            # Optimiza con lo guardado y recolecta métricas nuevas en segundo plano
+            print("\n🔍 Fase 1: Cargando métricas persistidas (arranque en caliente)...")
+            with instrumentation.phase('carga'):
+                optimization_results = system.warm_start(duration_hours=0.5,
+                                                         cycle_interval=cycle_interval)
+            if optimization_results is None:
+                print("⚠ No hay métricas guardadas, se recolectarán nuevas")
+        if optimization_results is None:
+            print("\n🔍 Fase 1: Recolectando métricas de red...")
+            with instrumentation.phase('recoleccion'):
+                metrics_data = system.collect_comprehensive_metrics(duration_hours=0.5,  # 30 minutos para demo
+                                                                    cycle_interval=cycle_interval)
+            
+            # Verificar que se recolectaron datos
+            if not len(metrics_data):
+                print("❌ No se pudieron recolectar métricas válidas")
+                return 1
+            
+            # Fase 2: Procesamiento y optimización
+            print("\n⚙️ Fase 2: Procesando datos y optimizando rutas...")
+            with instrumentation.phase('optimizacion'):
+                optimization_results = system.process_and_analyze(metrics_data)
         
         if not optimization_results:
             print("❌ No se pudieron generar rutas optimizadas")
@@ -596,17 +3704,20 @@ def main():
         
         # Fase 3: Validación
         print("\n✅ Fase 3: Validando resultados...")
-        validation_summary, aggregate_metrics = system.validate_results(optimization_results)
+        with instrumentation.phase('validacion'), system.refresh_lock:
+            validation_summary, aggregate_metrics = system.validate_results(optimization_results)
         
         # Fase 4: Generación de reporte
         print("\n📊 Fase 4: Generando reporte comprehensivo...")
-        final_report = system.generate_comprehensive_report(
-            optimization_results, validation_summary, aggregate_metrics
-        )
+        with instrumentation.phase('reporte'):
+            final_report = system.generate_comprehensive_report(
+                optimization_results, validation_summary, aggregate_metrics
+            )
         
         # Fase 5: Crear visualizaciones
         print("\n📈 Fase 5: Creando visualizaciones...")
-        system.create_visualization(optimization_results)
+        with instrumentation.phase('visualizacion'):
+            system.create_visualization(optimization_results)
         
         # Mostrar resumen de resultados
         print("\n" + "=" * 60)
@@ -621,11 +3732,30 @@ def main():
         print(f"🔍 Rutas analizadas: {len(optimization_results)}")
         print(f"✅ Validaciones realizadas: {len(validation_summary)}")
         
+        print("\n⏱️ TIEMPO POR FASE:")
+        for phase_name, phase_stats in instrumentation.phases.items():
+            print(f"   {phase_name}: {phase_stats['total_seconds']:.2f}s")
+        counters = instrumentation.counters
+        print(f"   Sondeos: {counters.get('probes_sent', 0)} "
+              f"({counters.get('probe_timeouts', 0)} sin respuesta), "
+              f"búsquedas Dijkstra: {counters.get('dijkstra_runs', 0)}, "
+              f"evaluaciones difusas: {counters.get('fuzzy_evaluations', 0)}")
+        
         if final_report['key_findings']:
             print("\n🔑 HALLAZGOS CLAVE:")
             for finding in final_report['key_findings']:
                 print(f"   {finding}")
         
+        if system.refresh_thread is not None and system.refresh_thread.is_alive():
+            # Cada ciclo ya se vuelca al disco; sin --wait-refresh se descarta el ciclo en curso
+            if args.wait_refresh:
+                print("\n🔄 Esperando a que termine la actualización de métricas en segundo plano...")
+                system.refresh_thread.join()
+            else:
+                system.stop_refresh()
+                print("\n🔄 Actualización de métricas interrumpida; los ciclos completos "
+                      "quedan guardados para el próximo arranque")
+        
         print("\n✨ Análisis completado exitosamente!")
         
     except Exception as e:
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del pipeline de optimización de rutas
+Mide rendimiento, percentiles de latencia y memoria pico sobre topologías sintéticas
+(de 10 a 10,000 nodos) y guarda los resultados en JSON para comparar versiones
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import networkx as nx
+from datetime import datetime, timedelta
+
+from Proyecto import (NetworkGraphOptimizer, NetworkOptimizationSystem, ResultValidator,
+                      SimulatedNetworkBackend)
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+
+def synthetic_topology(node_count, degree=6, seed=0):
+    """Topología conexa: anillo más cuerdas aleatorias hasta el grado medio pedido"""
+    rng = random.Random(seed)
+    nodes = [f"N{i}" for i in range(node_count)]
+    links = set()
+    for i in range(node_count):
+        links.add(tuple(sorted((i, (i + 1) % node_count))))
+    target_links = max(len(links), min(node_count * degree // 2,
+                                       node_count * (node_count - 1) // 2))
+    while len(links) < target_links:
+        a, b = rng.randrange(node_count), rng.randrange(node_count)
+        if a != b:
+            links.add(tuple(sorted((a, b))))
+    return nodes, [(nodes[a], nodes[b]) for a, b in sorted(links)]
+
+def synthetic_metrics(links, seed=0, samples=3):
+    """Mediciones simuladas por enlace con el formato de collect_comprehensive_metrics"""
+    backend = SimulatedNetworkBackend(seed=seed)
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    metrics_data = {}
+    for source, destination in links:
+        profile = backend.link_profile(source, destination)
+        latencies = rng.normal(profile['latency'], profile['jitter'], samples).clip(0.1)
+        availability = rng.uniform(90, 100)
+        metrics_data[f"{source}-{destination}"] = [{
+            'timestamp': (start + timedelta(seconds=30 * i)).isoformat(),
+            'latency': float(latency),
+            'packet_loss': profile['loss'] * 100,
+            'availability': float(availability),
+            'jitter': profile['jitter']
+        } for i, latency in enumerate(latencies)]
+    return metrics_data
+
+def averaged(metrics_data):
+    """Promedio simple por enlace (entrada de build_network_graph)"""
+    return {pair_key: {name: float(np.mean([m[name] for m in measurements]))
+                       for name in ('latency', 'packet_loss', 'availability')}
+            for pair_key, measurements in metrics_data.items()}
+
+class BenchmarkRunner:
+    """Ejecuta casos de benchmark y acumula sus resultados"""
+    
+    def __init__(self, min_time=1.0, max_calls=1000, measure_memory=True):
+        self.min_time = min_time  # Tiempo mínimo de medición por caso (segundos)
+        self.max_calls = max_calls
+        self.measure_memory = measure_memory
+        self.results = []
+    
+    def run(self, name, nodes, edges, func, setup=None, items_per_call=1, max_calls=None):
+        """Mide func() repetidamente; setup() se ejecuta antes de cada llamada sin cronometrar"""
+        max_calls = max_calls or self.max_calls
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < max_calls and (not timings or time.perf_counter() - started < self.min_time):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - t0)
+        
+        # La memoria se mide en una llamada aparte: tracemalloc ralentiza la ejecución
+        peak_memory = None
+        if self.measure_memory:
+            if setup is not None:
+                setup()
+            tracemalloc.start()
+            try:
+                func()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        
+        timings_ms = np.array(timings) * 1000
+        total = float(np.sum(timings))
+        result = {
+            'benchmark': name,
+            'nodes': nodes,
+            'edges': edges,
+            'calls': len(timings),
+            'total_seconds': round(total, 6),
+            'calls_per_second': round(len(timings) / total, 3) if total > 0 else None,
+            'items_per_second': round(len(timings) * items_per_call / total, 3) if total > 0 else None,
+            'latency_ms': {
+                'mean': round(float(timings_ms.mean()), 6),
+                'p50': round(float(np.percentile(timings_ms, 50)), 6),
+                'p95': round(float(np.percentile(timings_ms, 95)), 6),
+                'p99': round(float(np.percentile(timings_ms, 99)), 6),
+                'max': round(float(timings_ms.max()), 6)
+            },
+            'peak_memory_kb': round(peak_memory / 1024, 1) if peak_memory is not None else None
+        }
+        self.results.append(result)
+        print(f"{name:<28} {nodes:>6} nodos  {result['calls']:>6} llamadas  "
+              f"p50={result['latency_ms']['p50']:.3f}ms  p95={result['latency_ms']['p95']:.3f}ms  "
+              f"p99={result['latency_ms']['p99']:.3f}ms  "
+              f"mem={result['peak_memory_kb'] if peak_memory is not None else '-'}KB")
+        return result
+
+def benchmark_size(runner, node_count, seed=0, query_count=200, analyze_max_nodes=100,
+                   benchmarks=None):
+    """Ejecuta todos los benchmarks sobre una topología de node_count nodos"""
+    def enabled(name):
+        return benchmarks is None or name in benchmarks
+    
+    nodes, links = synthetic_topology(node_count, seed=seed)
+    metrics_data = synthetic_metrics(links, seed=seed)
+    averaged_metrics = averaged(metrics_data)
+    edge_count = len(links)
+    rng = random.Random(seed)
+    
+    optimizer = NetworkGraphOptimizer()
+    optimizer.build_network_graph(averaged_metrics, nodes, links)
+    link_metrics = list(averaged_metrics.values())
+    
+    if enabled('evaluate_link_quality'):
+        evaluator = optimizer.fuzzy_evaluator
+        sample = [link_metrics[rng.randrange(len(link_metrics))] for _ in range(query_count)]
+        calls = iter(range(10 ** 9))
+        
+        def evaluate():
+            metrics = sample[next(calls) % len(sample)]
+            evaluator.evaluate_link_quality(metrics['latency'], metrics['availability'],
+                                            metrics['packet_loss'])
+        runner.run('evaluate_link_quality', node_count, edge_count, evaluate)
+    
+    if enabled('build_network_graph'):
+        runner.run('build_network_graph', node_count, edge_count,
+                   lambda: optimizer.build_network_graph(averaged_metrics, nodes, links),
+                   items_per_call=edge_count, max_calls=50)
+    
+    # Consultas sobre pares aleatorios, con las cachés vacías para medir el cálculo completo
+    pairs = [tuple(rng.sample(nodes, 2)) for _ in range(query_count)]
+    
+    def clear_caches():
+        optimizer.route_cache.clear()
+        optimizer.distance_cache.clear()
+    
+    if enabled('find_optimal_route'):
+        queries = iter(range(10 ** 9))
+        runner.run('find_optimal_route', node_count, edge_count,
+                   lambda: optimizer.find_optimal_route(*pairs[next(queries) % len(pairs)]),
+                   setup=clear_caches)
+    
+    if enabled('compare_routes'):
+        queries = iter(range(10 ** 9))
+        runner.run('compare_routes', node_count, edge_count,
+                   lambda: optimizer.compare_routes(*pairs[next(queries) % len(pairs)], k=3),
+                   setup=clear_caches)
+    
+    if enabled('process_and_analyze') and node_count <= analyze_max_nodes:
+        # El análisis completo corre Yen (k=3) para cada par no ordenado: O(n²) búsquedas
+        # de k rutas, ~14 s a 100 nodos. Por eso solo se mide en tamaños moderados
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, 'topology.json')
+            with open(config_path, 'w') as f:
+                json.dump({'nodes': {node: node for node in nodes},
+                           'links': [list(link) for link in links]}, f)
+            system = NetworkOptimizationSystem(config_path=config_path,
+                                               probe_backend=SimulatedNetworkBackend(seed=seed))
+        
+        def reset_system():
+            system.optimizer = NetworkGraphOptimizer()
+        runner.run('process_and_analyze', node_count, edge_count,
+                   lambda: system.process_and_analyze(metrics_data), setup=reset_system,
+                   items_per_call=node_count * (node_count - 1), max_calls=20)
+    
+    if enabled('calculate_aggregate_metrics'):
+        # Validaciones sintéticas: una por enlace, con error de predicción aleatorio
+        actual = np.array([metrics['latency'] for metrics in link_metrics])
+        predicted = actual * np.random.default_rng(seed).normal(1.0, 0.1, len(actual))
+        validator = ResultValidator()
+        
+        def validate_all():
+            for p, a in zip(predicted, actual):
+                validator.validate_prediction(float(p), float(a))
+        
+        def reset_validator():
+            nonlocal validator
+            validator = ResultValidator()
+        runner.run('validate_prediction', node_count, edge_count, validate_all,
+                   setup=reset_validator, items_per_call=len(actual), max_calls=50)
+        validate_all()
+        runner.run('calculate_aggregate_metrics', node_count, edge_count,
+                   validator.calculate_aggregate_metrics)
+
+def compare_results(current, previous, threshold=0.10):
+    """Compara p50 y memoria con una ejecución anterior; devuelve las regresiones"""
+    previous_index = {(r['benchmark'], r['nodes']): r for r in previous['results']}
+    regressions = []
+    print(f"\n{'benchmark':<28} {'nodos':>6} {'p50 antes':>11} {'p50 ahora':>11} {'cambio':>8}")
+    for result in current['results']:
+        before = previous_index.get((result['benchmark'], result['nodes']))
+        if before is None:
+            continue
+        old_p50, new_p50 = before['latency_ms']['p50'], result['latency_ms']['p50']
+        change = (new_p50 - old_p50) / old_p50 if old_p50 > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  ⚠ regresión'
+            regressions.append((result['benchmark'], result['nodes'], 'p50', change))
+        old_memory, new_memory = before.get('peak_memory_kb'), result.get('peak_memory_kb')
+        if old_memory and new_memory and (new_memory - old_memory) / old_memory > threshold:
+            flag += '  ⚠ memoria'
+            regressions.append((result['benchmark'], result['nodes'], 'memory',
+                                (new_memory - old_memory) / old_memory))
+        print(f"{result['benchmark']:<28} {result['nodes']:>6} {old_p50:>9.3f}ms "
+              f"{new_p50:>9.3f}ms {change:>+7.1%}{flag}")
+    return regressions
+
+def environment_info():
+    """Datos del entorno para poder interpretar los resultados más adelante"""
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'numpy': np.__version__,
+        'networkx': nx.__version__
+    }
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de optimización de rutas")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="número de nodos de cada topología sintética")
+    parser.add_argument('--benchmarks', nargs='+', default=None,
+                        help="ejecutar solo estos benchmarks")
+    parser.add_argument('--seed', type=int, default=0, help="semilla de las topologías")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="pares aleatorios distintos por benchmark de consulta")
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help="segundos mínimos de medición por caso")
+    parser.add_argument('--analyze-max-nodes', type=int, default=100,
+                        help="tamaño máximo para process_and_analyze (todos los pares)")
+    parser.add_argument('--no-memory', action='store_true', help="no medir memoria pico")
+    parser.add_argument('--output', default=None,
+                        help="archivo JSON de resultados (por defecto benchmark_<fecha>.json)")
+    parser.add_argument('--compare', default=None,
+                        help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="empeoramiento relativo a partir del cual se marca regresión")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    
+    # Los registros por ruta dominarían la medición
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    runner = BenchmarkRunner(min_time=args.min_time, measure_memory=not args.no_memory)
+    for node_count in args.sizes:
+        benchmark_size(runner, node_count, seed=args.seed, query_count=args.queries,
+                       analyze_max_nodes=args.analyze_max_nodes, benchmarks=args.benchmarks)
+    
+    report = {'environment': environment_info(), 'results': runner.results}
+    output = args.output or f'benchmark_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare_results(report, previous, args.threshold)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())